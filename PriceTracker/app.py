@@ -1,5 +1,5 @@
 from app import create_app, start_scheduler
-from app.models.models import db
+from app.models.models import db, upgrade_schema
 import logging
 
 # Configure standard Python logging
@@ -14,6 +14,7 @@ app = create_app()
 with app.app_context():
     # Initialize SQLite database file if it doesn't exist
     db.create_all()
+    upgrade_schema()
     # Safely kick off APScheduler in the background
     start_scheduler(app)
 
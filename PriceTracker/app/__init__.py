@@ -2,6 +2,7 @@ from flask import Flask
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask_login import LoginManager
 import logging
+from datetime import datetime
 from config import Config
 from app.models.models import db, User
 
@@ -36,16 +37,25 @@ def create_app(config_class=Config):
     app.register_blueprint(admin_bp)
 
     # ── Global template context ──────────────────────────────────────────────
-    # Inject notification variables into ALL templates so base.html always works
+    # Inject notification variables into ALL templates so base.html always works.
+    # Served from the in-memory notification cache; no queries on a hit.
+    from app.services.notification_cache import notification_cache
+    notification_cache.ttl = app.config.get('NOTIFICATION_CACHE_TTL', 300)
+
+    from app.services.events import event_bus
+    event_bus.max_subscribers = app.config.get('SSE_MAX_SUBSCRIBERS', 50)
+
+    from app.services.history_store import history_store
+    from app.services.series_store import series_store
+    history_store.init_app(app)
+    series_store.init_app(app)
+
     @app.context_processor
     def inject_notifications():
         from flask_login import current_user
-        from app.models.models import Notification
         if current_user.is_authenticated:
             try:
-                unread_count  = current_user.notifications.filter_by(is_read=False).count()
-                recent_notifs = current_user.notifications.order_by(
-                    Notification.created_at.desc()).limit(10).all()
+                unread_count, recent_notifs = notification_cache.get(current_user.id)
             except Exception:
                 unread_count, recent_notifs = 0, []
         else:
@@ -59,6 +69,14 @@ def start_scheduler(app):
     Starts the APScheduler background tasks using the application context.
     """
     import app.scheduler.tasks as scheduler_tasks
+    from app.email.outbox import run_outbox
+    from app.scheduler.daily_summary import send_daily_summaries
+    from app.scheduler.retention import run_retention
+    from app.services.history_archive import run_history_archive
+    from app.services.series_store import run_rebuild
+    from app.scheduler.scrape_queue import scrape_queue
+    scrape_queue.start(app)
+
     interval_hours = app.config.get('CHECK_INTERVAL', 6)
     
     # Store app config in scheduler so it can create contexts later
@@ -69,5 +87,55 @@ def start_scheduler(app):
             trigger='interval',
             hours=interval_hours
         )
+        background_scheduler.add_job(
+            id='email_outbox',
+            func=run_outbox,
+            args=[app],
+            trigger='interval',
+            seconds=app.config.get('OUTBOX_DRAIN_SECONDS', 30),
+            max_instances=1,
+            coalesce=True
+        )
+        summary_hour = app.config.get('DAILY_SUMMARY_HOUR', 9)
+        if summary_hour >= 0:
+            background_scheduler.add_job(
+                id='daily_summary',
+                func=send_daily_summaries,
+                args=[app],
+                trigger='cron',
+                hour=summary_hour,
+                max_instances=1,
+                coalesce=True
+            )
+        background_scheduler.add_job(
+            id='notification_retention',
+            func=run_retention,
+            args=[app],
+            trigger='cron',
+            hour=app.config.get('NOTIFICATION_RETENTION_HOUR', 3),
+            max_instances=1,
+            coalesce=True
+        )
+        background_scheduler.add_job(
+            id='series_rebuild',
+            func=run_rebuild,
+            args=[app],
+            trigger='cron',
+            hour=app.config.get('SERIES_REBUILD_HOUR', 2),
+            next_run_time=datetime.now(),     # and once at startup
+            max_instances=1,
+            coalesce=True
+        )
+        archive_hour = app.config.get('HISTORY_ARCHIVE_HOUR', 4)
+        if archive_hour >= 0:
+            background_scheduler.add_job(
+                id='history_archive',
+                func=run_history_archive,
+                args=[app],
+                trigger='cron',
+                hour=archive_hour,
+                max_instances=1,
+                coalesce=True
+            )
         background_scheduler.start()
         app.logger.info(f"Background Scheduler started. Running every {interval_hours} hours.")
@@ -0,0 +1,63 @@
+"""
+Alert Digest.
+Collects every drop / target-hit alert raised during one price-check run
+and sends each user a single digest email when the run ends, instead of one
+email per product. Mega drops can still go out immediately
+(EMAIL_MEGA_IMMEDIATE).
+"""
+import logging
+from collections import defaultdict
+from flask import current_app
+from app.email.email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+KIND_DROP = 'drop'
+KIND_TARGET = 'target'
+
+
+class AlertDigest:
+    """Per-run buffer of alert events keyed by user."""
+
+    def __init__(self):
+        self._events = defaultdict(list)    # user_id -> [event, ...]
+        self._recipients = {}               # user_id -> (email, name)
+        self.immediate = 0
+
+    def add(self, user_id: int, email: str, name: str, kind: str, product_name: str,
+            url: str, old_price: float, new_price: float, drop_pct: float, severity: str):
+        if not email:
+            return
+        if severity == 'mega' and current_app.config.get('EMAIL_MEGA_IMMEDIATE', True):
+            EmailService.send_price_drop_alert(product_name, old_price, new_price, url, recipient_email=email)
+            self.immediate += 1
+            return
+        self._recipients[user_id] = (email, name)
+        self._events[user_id].append({
+            'kind': kind,
+            'product_name': product_name or 'Product',
+            'url': url,
+            'old_price': old_price,
+            'new_price': new_price,
+            'drop_pct': drop_pct,
+        })
+
+    def __len__(self):
+        return sum(len(v) for v in self._events.values())
+
+    def flush(self) -> int:
+        """Sends one email per user (a plain alert if they only have one). Returns emails queued."""
+        sent = 0
+        for user_id, events in self._events.items():
+            email, name = self._recipients[user_id]
+            if len(events) == 1:
+                e = events[0]
+                ok = EmailService.send_price_drop_alert(e['product_name'], e['old_price'], e['new_price'],
+                                                        e['url'], recipient_email=email)
+            else:
+                ok = EmailService.send_alert_digest(email, name, events)
+            sent += bool(ok)
+        logger.info(f"📧 Digest: {len(self)} alerts → {sent} emails ({self.immediate} sent immediately)")
+        self._events.clear()
+        self._recipients.clear()
+        return sent
@@ -0,0 +1,249 @@
+"""
+Email Outbox.
+EmailService queues messages in the `email_outbox` table instead of talking
+to SMTP inline. A background job drains the table in batches, reusing one
+authenticated SMTP connection per batch, with retry/backoff and a send-rate
+limit. Works against any SMTP server, including a local stand-in
+(see SMTP_* settings in config.py).
+
+Producers only add rows to the caller's session; the caller commits them
+with its own changes. Each sender claims its batch row by row with a
+conditional UPDATE (pending -> sending), so several workers or schedulers
+never send the same row. A claim left behind by a sender that died is
+taken over after CLAIM_TIMEOUT.
+"""
+import smtplib
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from flask import current_app
+from sqlalchemy import insert, update, select, func, or_, and_
+from app.models.models import db, EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = 3600          # seconds
+MAX_BATCHES_PER_RUN = 20    # keep one scheduler run bounded
+CLAIM_TIMEOUT = 900         # seconds before a 'sending' row is considered abandoned
+
+metrics = {
+    'queued': 0,
+    'sent': 0,
+    'retried': 0,
+    'failed': 0,
+    'batches': 0,
+    'connections': 0,
+    'connect_errors': 0,
+    'last_batch_seconds': None,
+}
+_metrics_lock = threading.Lock()
+_drain_lock = threading.Lock()
+
+
+def _count(key: str, n: int = 1):
+    with _metrics_lock:
+        metrics[key] += n
+
+
+def _sender() -> str:
+    return (current_app.config.get('EMAIL_USER') or '').strip()
+
+
+def smtp_configured() -> bool:
+    """True if there is enough config to send (sender, plus a password when auth is on)."""
+    password = (current_app.config.get('EMAIL_PASSWORD') or '').strip()
+    return bool(_sender()) and (bool(password) or not current_app.config.get('SMTP_USE_AUTH', True))
+
+
+def build_message(sender: str, to_email: str, subject: str, html_body: str) -> MIMEMultipart:
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = f"PriceTracker Pro <{sender}>"
+    msg['To'] = to_email
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+
+def open_smtp() -> smtplib.SMTP:
+    """Connects (and STARTTLS / logs in, if configured) once for a whole batch."""
+    cfg = current_app.config
+    server = smtplib.SMTP(cfg.get('SMTP_SERVER', 'smtp.gmail.com'), cfg.get('SMTP_PORT', 587), timeout=15)
+    server.ehlo()
+    if cfg.get('SMTP_USE_TLS', True):
+        server.starttls()
+        server.ehlo()
+    if cfg.get('SMTP_USE_AUTH', True):
+        server.login(_sender(), (cfg.get('EMAIL_PASSWORD') or '').strip())
+    _count('connections')
+    return server
+
+
+# ── Producers ─────────────────────────────────────────────────────────────────
+def enqueue(to_email: str, subject: str, html_body: str) -> bool:
+    """Queues one email in the current session (the caller commits). Returns False if email isn't configured."""
+    if not smtp_configured():
+        logger.warning("EMAIL_USER / EMAIL_PASSWORD not set — skipping email.")
+        return False
+    db.session.add(EmailOutbox(to_email=to_email, subject=subject, html_body=html_body))
+    db.session.flush()
+    _count('queued')
+    return True
+
+
+def enqueue_many(messages: list) -> int:
+    """Queues [(to_email, subject, html_body), ...] with one bulk INSERT; the caller commits."""
+    if not messages or not smtp_configured():
+        return 0
+    now = datetime.utcnow()
+    db.session.execute(insert(EmailOutbox), [
+        {'to_email': to, 'subject': subject, 'html_body': html,
+         'status': EmailOutbox.STATUS_PENDING, 'attempts': 0,
+         'next_attempt_at': now, 'created_at': now}
+        for to, subject, html in messages
+    ])
+    _count('queued', len(messages))
+    return len(messages)
+
+
+def send_now(to_email: str, subject: str, html_body: str) -> bool:
+    """Sends immediately, bypassing the outbox (admin test email)."""
+    if not smtp_configured():
+        logger.warning("EMAIL_USER / EMAIL_PASSWORD not set — skipping email.")
+        return False
+    try:
+        server = open_smtp()
+        try:
+            server.sendmail(_sender(), to_email, build_message(_sender(), to_email, subject, html_body).as_string())
+        finally:
+            server.quit()
+        _count('sent')
+        logger.info(f"📧 Email sent to {to_email} — {subject}")
+        return True
+    except Exception as e:
+        logger.error(f"Email send failed to {to_email}: {e}")
+        return False
+
+
+# ── Sender ────────────────────────────────────────────────────────────────────
+def _schedule_retry(row: EmailOutbox, error: Exception):
+    row.attempts = (row.attempts or 0) + 1
+    row.last_error = str(error)[:512]
+    if row.attempts >= current_app.config.get('EMAIL_MAX_ATTEMPTS', 5):
+        row.status = EmailOutbox.STATUS_FAILED
+        _count('failed')
+        logger.error(f"Email to {row.to_email} failed permanently: {error}")
+    else:
+        row.status = EmailOutbox.STATUS_PENDING
+        delay = min(MAX_BACKOFF, 60 * 2 ** (row.attempts - 1))
+        row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        _count('retried')
+        logger.warning(f"Email to {row.to_email} failed ({error}); retry in {delay}s")
+
+
+def _claim(batch_size: int) -> list:
+    """
+    Marks up to `batch_size` due rows 'sending' and returns them. Each row
+    is taken with its own conditional UPDATE, so a row another sender got
+    first simply matches nothing.
+    """
+    now = datetime.utcnow()
+    due = or_(and_(EmailOutbox.status == EmailOutbox.STATUS_PENDING, EmailOutbox.next_attempt_at <= now),
+              and_(EmailOutbox.status == EmailOutbox.STATUS_SENDING,
+                   EmailOutbox.claimed_at < now - timedelta(seconds=CLAIM_TIMEOUT)))
+    ids = db.session.execute(select(EmailOutbox.id).where(due).order_by(EmailOutbox.id).limit(batch_size)).scalars().all()
+    claimed = [row_id for row_id in ids if db.session.execute(
+        update(EmailOutbox).where(EmailOutbox.id == row_id, due)
+        .values(status=EmailOutbox.STATUS_SENDING, claimed_at=now)
+        .execution_options(synchronize_session=False)).rowcount]
+    db.session.commit()
+    if not claimed:
+        return []
+    return EmailOutbox.query.filter(EmailOutbox.id.in_(claimed)).order_by(EmailOutbox.id).all()
+
+
+def drain_outbox(batch_size: int = None) -> int:
+    """
+    Sends one batch of due emails over a single SMTP connection.
+    Returns the number sent. Overlapping calls in this process return 0
+    immediately; other processes are kept apart by the row claims.
+    """
+    if not _drain_lock.acquire(blocking=False):
+        return 0
+    try:
+        cfg = current_app.config
+        batch_size = batch_size or cfg.get('EMAIL_BATCH_SIZE', 50)
+        if not smtp_configured():
+            return 0
+        rows = _claim(batch_size)
+        if not rows:
+            return 0
+
+        started = time.monotonic()
+        min_interval = 60.0 / max(cfg.get('EMAIL_RATE_PER_MIN', 60), 1)
+        sender = _sender()
+        server = None
+        sent = 0
+        last_send = 0.0
+        try:
+            for i, row in enumerate(rows):
+                wait = last_send + min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    if server is None:
+                        server = open_smtp()
+                except (smtplib.SMTPException, OSError) as e:
+                    # Can't reach or log in to the server: leave the rest pending for the next run
+                    _count('connect_errors')
+                    logger.error(f"Outbox: SMTP connect failed: {e}")
+                    for unsent in rows[i:]:
+                        unsent.status = EmailOutbox.STATUS_PENDING
+                    db.session.commit()
+                    break
+                try:
+                    server.sendmail(sender, row.to_email,
+                                    build_message(sender, row.to_email, row.subject, row.html_body).as_string())
+                    row.status = EmailOutbox.STATUS_SENT
+                    row.sent_at = datetime.utcnow()
+                    sent += 1
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    _schedule_retry(row, e)
+                    server = None    # reconnect for the next message
+                except smtplib.SMTPException as e:
+                    _schedule_retry(row, e)
+                last_send = time.monotonic()
+                db.session.commit()
+        finally:
+            if server is not None:
+                try:
+                    server.quit()
+                except Exception:
+                    pass
+
+        _count('sent', sent)
+        _count('batches')
+        metrics['last_batch_seconds'] = round(time.monotonic() - started, 2)
+        logger.info(f"📧 Outbox: sent {sent}/{len(rows)} emails")
+        return sent
+    finally:
+        _drain_lock.release()
+
+
+def run_outbox(app):
+    """Scheduler job: drains due emails, a bounded number of batches per run."""
+    with app.app_context():
+        batch_size = app.config.get('EMAIL_BATCH_SIZE', 50)
+        for _ in range(MAX_BATCHES_PER_RUN):
+            if drain_outbox(batch_size) < batch_size:
+                break
+
+
+def outbox_stats() -> dict:
+    """Sender counters plus current queue depth by status."""
+    counts = dict(db.session.query(EmailOutbox.status, func.count(EmailOutbox.id))
+                  .group_by(EmailOutbox.status).all())
+    with _metrics_lock:
+        return {**metrics, 'queue': counts}
@@ -0,0 +1,50 @@
+"""
+Email Rendering.
+Email bodies are Jinja2 templates in app/templates/email/ sharing one
+layout and a button macro. Each template is compiled once per process and
+kept, so a render is a single call into precompiled code — no per-call
+parsing or string concatenation. Works without an app context.
+"""
+import os
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+TEMPLATES = ('price_drop', 'alert_digest', 'welcome', 'daily_summary', 'test')
+TREND_ICONS = {'down': '📉', 'up': '📈'}
+
+
+def _inr(value, decimals: int = 0) -> str:
+    return f"₹{value:,.{decimals}f}"
+
+
+def _trend_icon(trend) -> str:
+    return TREND_ICONS.get(trend, '➖')
+
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    auto_reload=False,     # templates are compiled once per process
+    cache_size=-1,
+)
+env.filters['inr'] = _inr
+env.filters['trend_icon'] = _trend_icon
+
+_compiled = {}
+
+
+def get_template(name: str):
+    template = _compiled.get(name)
+    if template is None:
+        template = _compiled[name] = env.get_template(f'email/{name}.html')
+    return template
+
+
+def render(name: str, **context) -> str:
+    return get_template(name).render(**context)
+
+
+def warm():
+    """Compiles every email template up front (optional; otherwise done on first use)."""
+    for name in TEMPLATES:
+        get_template(name)
@@ -13,6 +13,8 @@ user_products = db.Table('user_products',
     db.Column('wishlisted', db.Boolean, default=False),
     db.Column('added_at', db.DateTime, default=datetime.utcnow)
 )
+# The primary key leads with user_id; alert fan-out looks trackers up by product
+db.Index('ix_user_products_product_target', user_products.c.product_id, user_products.c.target_price)
 
 class User(UserMixin, db.Model):
     """
@@ -63,6 +65,11 @@ class Notification(db.Model):
     Stores events like price drops, scrape failures, new products.
     """
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # bell dropdown / unread count / keyset listing per user
+        db.Index('ix_notifications_user_created', 'user_id', 'created_at'),
+        db.Index('ix_notifications_user_read', 'user_id', 'is_read'),
+    )
 
     SEVERITY_NORMAL = 'normal'    # < 5% drop
     SEVERITY_HOT = 'hot'          # 15%+ drop  🔥
@@ -75,11 +82,85 @@ class Notification(db.Model):
     type = db.Column(db.String(50), default='info')   # info, drop, error, stock
     severity = db.Column(db.String(20), default='normal')
     is_read = db.Column(db.Boolean, default=False)
+    repeat_count = db.Column(db.Integer, default=1)   # repeated errors collapsed into this row
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     user = db.relationship('User', backref=db.backref('notifications', lazy='dynamic', cascade='all, delete-orphan'))
 
 
+class NotificationArchive(db.Model):
+    """
+    Read notifications moved out of `notifications` by the retention job
+    (see app/scheduler/retention.py), kept for reporting.
+    """
+    __tablename__ = 'notifications_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    notification_id = db.Column(db.Integer, nullable=False)   # id of the original row
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=True)
+    message = db.Column(db.String(512), nullable=False)
+    type = db.Column(db.String(50))
+    severity = db.Column(db.String(20))
+    repeat_count = db.Column(db.Integer, default=1)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class DataVersion(db.Model):
+    """
+    Change counter per product and per user (plus one 'all' row for bulk
+    changes). HTTP validators are built from these, so every worker and
+    every restart hands out the same ETag for the same data.
+    """
+    __tablename__ = 'data_versions'
+
+    scope = db.Column(db.String(10), primary_key=True)     # 'product' | 'user' | 'all'
+    ref_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class JobCursor(db.Model):
+    """
+    Where a long batch job got to, so a run cut short by its time budget
+    is picked up by the next one (see app/scheduler/daily_summary.py).
+    """
+    __tablename__ = 'job_cursors'
+
+    name = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.String(10), nullable=False)          # 'YYYY-MM-DD' of the round
+    start_id = db.Column(db.Integer, nullable=False, default=0)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    complete = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class EmailOutbox(db.Model):
+    """
+    Outgoing email waiting to be sent.
+    Rows are drained in batches by the background sender (app/email/outbox.py).
+    """
+    __tablename__ = 'email_outbox'
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'    # claimed by one sender (see outbox._claim)
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'      # gave up after EMAIL_MAX_ATTEMPTS
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    to_email = db.Column(db.String(150), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default=STATUS_PENDING, index=True)
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    last_error = db.Column(db.String(512), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+
 class Product(db.Model):
     """
     Model representing a tracked e-commerce product.
@@ -97,16 +178,17 @@ class Product(db.Model):
     history = db.relationship('PriceHistory', backref='product', lazy=True, cascade='all, delete-orphan')
 
     def to_dict(self):
-        prices = [h.price for h in self.history if h.price is not None]
+        from app.services.history_store import history_store
+        lowest, highest, checks = history_store.stats([self.id]).get(self.id, (None, None, 0))
         return {
             "id": self.id,
             "name": self.product_name or "Fetching details…",
             "url": self.url,
             "image": self.image_url,
             "current_price": self.last_price,
-            "lowest_ever": min(prices) if prices else None,
-            "highest_ever": max(prices) if prices else None,
-            "price_checks": len(prices),
+            "lowest_ever": lowest,
+            "highest_ever": highest,
+            "price_checks": checks,
             "tracked_since": self.created_at.strftime('%d %b %Y')
         }
 
@@ -116,6 +198,10 @@ class PriceHistory(db.Model):
     Model storing historical price records for products.
     """
     __tablename__ = 'price_history'
+    __table_args__ = (
+        # "latest price per product before X" (trends, daily summary)
+        db.Index('ix_price_history_product_checked', 'product_id', 'checked_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -129,3 +215,23 @@ class PriceHistory(db.Model):
             "price": self.price,
             "checked_at": self.checked_at.isoformat()
         }
+
+
+def upgrade_schema():
+    """
+    Brings an existing database up to date. create_all() only creates missing
+    tables, so columns and indexes added to existing tables later are
+    applied here. Safe to run on every start.
+    """
+    from sqlalchemy import inspect, text
+    columns = {c['name'] for c in inspect(db.engine).get_columns('notifications')}
+    if 'repeat_count' not in columns:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE notifications ADD COLUMN repeat_count INTEGER DEFAULT 1"))
+    columns = {c['name'] for c in inspect(db.engine).get_columns('email_outbox')}
+    if 'claimed_at' not in columns:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE email_outbox ADD COLUMN claimed_at DATETIME"))
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from functools import wraps
-from app.models.models import db, User, Product, PriceHistory, Notification
+from app.models.models import db, User, Product, Notification
+from app.services.data_version import data_versions
+from app.services.history_store import history_store
 from sqlalchemy import func
 import logging
 
@@ -28,7 +30,7 @@ def admin_required(f):
 def dashboard():
     total_users    = User.query.count()
     total_products = Product.query.count()
-    total_checks   = PriceHistory.query.count()
+    total_checks   = history_store.count()
     total_notifs   = Notification.query.count()
 
     # Latest 10 users
@@ -45,16 +47,7 @@ def dashboard():
     )
 
     # Price checks per day (last 7 days)
-    recent_checks = (
-        db.session.query(
-            func.date(PriceHistory.checked_at).label('day'),
-            func.count(PriceHistory.id).label('count')
-        )
-        .group_by(func.date(PriceHistory.checked_at))
-        .order_by(func.date(PriceHistory.checked_at).desc())
-        .limit(7)
-        .all()
-    )
+    recent_checks = history_store.checks_per_day(7)
 
     return render_template('admin/dashboard.html',
                            total_users=total_users,
@@ -82,6 +75,7 @@ def toggle_admin(user_id):
     else:
         user.is_admin = not user.is_admin
         db.session.commit()
+        data_versions.bump_users([user.id])
         flash(f"{'Granted' if user.is_admin else 'Revoked'} admin for {user.email}", "success")
     return redirect(url_for('admin.users'))
 
@@ -123,13 +117,13 @@ def test_email():
 @admin_bp.route('/run_check', methods=['POST'])
 @admin_required
 def run_check():
-    from app.scheduler.tasks import check_prices
-    try:
-        check_prices()
-        flash("✅ Manual price check completed!", "success")
-    except Exception as e:
-        flash(f"❌ Price check failed: {e}", "danger")
-    return redirect(url_for('admin.dashboard'))
+    """Start a background check of every product; progress via /api/jobs/<id>."""
+    from app.scheduler.jobs import check_jobs, SCOPE_ALL
+    job, created = check_jobs.submit(SCOPE_ALL, owner_id=current_user.id)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job.to_dict()), 202
+    flash("🔄 Price check started." if created else "🔄 A price check is already running.", "info")
+    return redirect(url_for('admin.dashboard', job=job.id))
 
 
 # ── API: scheduler stats ────────────────────────────────────────────────────
@@ -139,6 +133,39 @@ def api_stats():
     return jsonify({
         "total_users": User.query.count(),
         "total_products": Product.query.count(),
-        "total_price_checks": PriceHistory.query.count(),
+        "total_price_checks": history_store.count(),
         "total_notifications": Notification.query.count(),
     })
+
+
+@admin_bp.route('/api/scraper_stats')
+@admin_required
+def api_scraper_stats():
+    """Per-domain scrape latency percentiles, deadlines and hedge counters."""
+    from app.scraper.latency import latency
+    return jsonify(latency.stats())
+
+
+@admin_bp.route('/api/egress_stats')
+@admin_required
+def api_egress_stats():
+    """Throughput and per-domain health of every scraper egress."""
+    from app.scraper.egress import get_egress_pool
+    return jsonify(get_egress_pool().stats())
+
+
+@admin_bp.route('/api/email_stats')
+@admin_required
+def api_email_stats():
+    """Email outbox depth and sender counters."""
+    from app.email.outbox import outbox_stats
+    return jsonify(outbox_stats())
+
+
+@admin_bp.route('/api/history_archive')
+@admin_required
+def api_history_archive():
+    """Months of price history in the columnar archive, with row counts and sizes."""
+    from flask import current_app
+    from app.services.history_archive import stats
+    return jsonify(stats(current_app.config['HISTORY_ARCHIVE_DIR']))
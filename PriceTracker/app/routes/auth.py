@@ -35,8 +35,9 @@ def signup():
         try:
             from app.email.email_service import EmailService
             EmailService.send_welcome_email(email, name)
+            db.session.commit()
         except Exception:
-            pass
+            db.session.rollback()
 
         login_user(new_user)
         role_msg = " You have Admin access." if is_first_user else ""
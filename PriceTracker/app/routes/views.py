@@ -1,7 +1,18 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 import logging
-from app.models.models import db, Product, PriceHistory, Notification
+from datetime import datetime
+from functools import wraps
+import numpy as np
+from app.models.models import db, Product, Notification, user_products
+from app.utils.pagination import (PaginationError, encode_cursor, decode_cursor, parse_limit,
+                                  parse_time, parse_fields, after, page)
+from app.services.downsample import lttb, minmax
+from app.services.data_version import data_versions
+from app.services.history_store import history_store
+from app.services.series_store import series_store
+from app.services.price_predictor import predict_many
+from app.utils.http_cache import conditional
 
 logger = logging.getLogger(__name__)
 
@@ -17,15 +28,48 @@ def _get_severity(drop_pct: float) -> str:
     return 'normal'
 
 
+def _utc(seconds) -> datetime:
+    return datetime.utcfromtimestamp(int(seconds))
+
+
+def _tracked_ids(user_id: int) -> list:
+    return db.session.execute(
+        db.select(user_products.c.product_id).where(user_products.c.user_id == user_id)
+    ).scalars().all()
+
+
+def _user_scope(**_):
+    """Conditional-GET scope: the current user and everything they track."""
+    return current_user.id, _tracked_ids(current_user.id)
+
+
+def _tracked_product_required(view):
+    """404 unless the current user tracks `product_id`; goes above @conditional so a 304 is checked too."""
+    @wraps(view)
+    def wrapper(product_id, *args, **kwargs):
+        tracked = db.session.execute(
+            db.select(user_products.c.product_id)
+            .where(user_products.c.user_id == current_user.id, user_products.c.product_id == product_id)
+        ).first()
+        if tracked is None:
+            return jsonify({'error': 'Product not found'}), 404
+        return view(product_id, *args, **kwargs)
+    return wrapper
+
+
 def _build_dashboard_data(products):
     """Convert a list of Product objects into enriched dicts for the template."""
+    sparkline_points = current_app.config.get('SPARKLINE_POINTS', 60)
+    series = series_store.series_many([p.id for p in products])
+    predictions = predict_many([p.id for p in products], series=series)
     dashboard_data = []
     for p in products:
-        history = PriceHistory.query.filter_by(product_id=p.id)\
-                                    .order_by(PriceHistory.checked_at.asc()).all()
+        times, prices = series[p.id]
+        known = ~np.isnan(prices)
+        times, prices = times[known], prices[known]
 
-        prev_price = history[-2].price if len(history) >= 2 else p.last_price
-        curr_price = history[-1].price if history else p.last_price
+        prev_price = round(float(prices[-2]), 2) if len(prices) >= 2 else p.last_price
+        curr_price = round(float(prices[-1]), 2) if len(prices) else p.last_price
 
         # Guard: if price is still None (scraper hasn't run yet), skip analytics
         if curr_price is None:
@@ -47,6 +91,7 @@ def _build_dashboard_data(products):
                 "checked_at": "Pending first check…",
                 "history_points": [],
                 "history_labels": [],
+                "prediction": None,
             })
             continue
 
@@ -59,13 +104,13 @@ def _build_dashboard_data(products):
             elif curr_price > prev_price:
                 trend = "up"
 
-        prices = [h.price for h in history if h.price is not None]
-        lowest  = min(prices) if prices else curr_price
-        highest = max(prices) if prices else curr_price
-        avg     = round(float(sum(prices) / len(prices)), 2) if prices else curr_price
+        lowest  = round(float(prices.min()), 2) if len(prices) else curr_price
+        highest = round(float(prices.max()), 2) if len(prices) else curr_price
+        avg     = round(float(prices.mean(dtype=np.float64)), 2) if len(prices) else curr_price
         savings_pct = round(float((highest - curr_price) / highest * 100), 1) if highest else 0
 
         severity = _get_severity(diff_pct) if trend == "down" else "normal"
+        chart = minmax(prices.tolist(), sparkline_points)
 
         dashboard_data.append({
             "id": p.id,
@@ -82,25 +127,22 @@ def _build_dashboard_data(products):
             "highest": highest,
             "avg": avg,
             "savings_pct": savings_pct,
-            "checked_at": history[-1].checked_at.strftime('%d %b %H:%M') if history else "Never",
-            "history_points": prices,
-            "history_labels": [h.checked_at.strftime('%m/%d %H:%M') for h in history],
+            "checked_at": _utc(times[-1]).strftime('%d %b %H:%M') if len(times) else "Never",
+            "history_points": [round(float(prices[i]), 2) for i in chart],
+            "history_labels": [_utc(times[i]).strftime('%m/%d %H:%M') for i in chart],
+            "prediction": predictions[p.id],
         })
     return dashboard_data
 
 
 @bp.route('/')
 @login_required
+@conditional(_user_scope)
 def index():
     """Main dashboard — shows per-user tracked products."""
     products = current_user.tracked_products
     dashboard_data = _build_dashboard_data(products)
 
-    # Unread notification count for bell icon
-    unread_count = current_user.notifications.filter_by(is_read=False).count()
-    recent_notifs = current_user.notifications.order_by(
-        Notification.created_at.desc()).limit(10).all()
-
     # Gamification: total savings (only products with real prices)
     total_savings = sum(
         p['diff'] for p in dashboard_data if p['trend'] == 'down' and p['diff']
@@ -108,16 +150,19 @@ def index():
 
     return render_template('dashboard.html',
                            products=dashboard_data,
-                           unread_count=unread_count,
-                           recent_notifs=recent_notifs,
                            total_savings=total_savings)
 
 
 @bp.route('/add', methods=['POST'])
 @login_required
 def add_product():
-    """Add a new product URL to the user's tracking list."""
-    from app.scraper.product_scraper import ProductScraper
+    """
+    Add a new product URL to the user's tracking list. The product row is
+    saved right away and the first scrape runs on the background queue;
+    the dashboard polls /api/products/<id>/status for the result.
+    """
+    from app.scheduler.scrape_queue import scrape_queue, PRIORITY_HIGH
+    from app.scheduler.tasks import first_scrape
     from app.utils.url_cleaner import clean_url
 
     raw_url = request.form.get('url', '').strip()
@@ -135,44 +180,49 @@ def add_product():
         else:
             current_user.tracked_products.append(existing)
             db.session.commit()
+            data_versions.bump_users([current_user.id])
             flash("Added existing product to your list.", "success")
         return redirect(url_for('main.index'))
 
-    scraper = ProductScraper(url)
-    details = scraper.get_product_details()
-
-    name  = details.get('name')      if details else None
-    price = details.get('price')     if details else None
-    img   = details.get('image_url') if details else None
-
-    new_product = Product(url=url, product_name=name, last_price=price, image_url=img)
+    new_product = Product(url=url)
     db.session.add(new_product)
     current_user.tracked_products.append(new_product)
     db.session.commit()
+    data_versions.bump_users([current_user.id])
 
-    if price is not None:
-        db.session.add(PriceHistory(product_id=new_product.id, price=price))
-        db.session.add(Notification(
-            user_id=current_user.id,
-            product_id=new_product.id,
-            message=f"Now tracking \"{name or 'new product'}\" at ₹{price:,.0f}",
-            type='info'
-        ))
-        db.session.commit()
-        flash(f"Tracking started: {name}", "success")
-    else:
-        db.session.add(Notification(
-            user_id=current_user.id,
-            product_id=new_product.id,
-            message=f"Added product but price fetch failed. Will retry.",
-            type='error'
-        ))
-        db.session.commit()
-        flash("Product added — price fetch failed. Scheduler will retry.", "info")
+    scrape_queue.start(current_app._get_current_object())
+    scrape_queue.enqueue(('first', new_product.id), lambda: first_scrape(new_product.id),
+                         priority=PRIORITY_HIGH)
 
+    flash("Tracking started — fetching product details in the background.", "success")
     return redirect(url_for('main.index'))
 
 
+@bp.route('/api/products/<int:product_id>/status')
+@login_required
+def api_product_status(product_id):
+    """REST — lightweight first-scrape status for a product card."""
+    from app.scheduler.scrape_queue import scrape_queue
+
+    product = Product.query.get_or_404(product_id)
+    if product not in current_user.tracked_products:
+        return jsonify({'error': 'Product not found'}), 404
+    queued = scrape_queue.status(('first', product.id))
+    if product.last_price is not None:
+        status = 'ready'
+    elif queued in ('queued', 'running', 'failed'):
+        status = queued
+    else:
+        status = 'pending'
+    return jsonify({
+        'id': product.id,
+        'status': status,
+        'name': product.product_name,
+        'price': product.last_price,
+        'image': product.image_url,
+    })
+
+
 @bp.route('/delete/<int:product_id>', methods=['POST'])
 @login_required
 def delete_product(product_id):
@@ -181,6 +231,7 @@ def delete_product(product_id):
     if product in current_user.tracked_products:
         current_user.tracked_products.remove(product)
         db.session.commit()
+        data_versions.bump_users([current_user.id])
     flash('Removed from your tracking list.', 'success')
     return redirect(url_for('main.index'))
 
@@ -188,15 +239,31 @@ def delete_product(product_id):
 @bp.route('/force_check', methods=['POST'])
 @login_required
 def force_check():
-    """Manually run a price check right now."""
-    import app.scheduler.tasks as scheduler_tasks
-    try:
-        scheduler_tasks.check_prices()
-        flash('All prices refreshed!', 'success')
-    except Exception as e:
-        logger.error(f"Force check error: {e}")
-        flash('Error refreshing prices.', 'danger')
-    return redirect(url_for('main.index'))
+    """
+    Start a background price check of the current user's products and
+    return its job id at once. Repeated clicks join the running job.
+    """
+    from app.scheduler.jobs import check_jobs
+    product_ids = [p.id for p in current_user.tracked_products]
+    job, created = check_jobs.submit(f'user:{current_user.id}', product_ids, owner_id=current_user.id)
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job.to_dict()), 202
+    flash('Refreshing your prices…' if created else 'A price refresh is already running.', 'info')
+    return redirect(url_for('main.index', job=job.id))
+
+
+@bp.route('/api/jobs/<job_id>')
+@login_required
+def api_job(job_id):
+    """REST — progress of a background price check (done/total/failures/ETA)."""
+    from app.scheduler.jobs import check_jobs, SCOPE_ALL
+    job = check_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.scope != SCOPE_ALL and job.owner_id != current_user.id and not current_user.is_admin:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
 
 
 # ──── Notifications ────────────────────────────────────────────────────────
@@ -204,41 +271,168 @@ def force_check():
 @login_required
 def mark_notifications_read():
     """Mark all notifications as read."""
+    from app.services.notification_cache import notification_cache
     current_user.notifications.filter_by(is_read=False).update({'is_read': True})
     db.session.commit()
+    notification_cache.mark_all_read(current_user.id)
+    data_versions.bump_users([current_user.id])
     return jsonify({'status': 'ok'})
 
 
+# ──── Live updates ─────────────────────────────────────────────────────────
+@bp.route('/api/events')
+@login_required
+def api_events():
+    """
+    Server-Sent Events stream of the user's new notifications and price
+    changes on their tracked products. 503 + Retry-After when the process
+    already has SSE_MAX_SUBSCRIBERS streams open; the page polls instead.
+    """
+    from flask import Response
+    from app.services.events import event_bus, sse_stream, user_topic, product_topic
+    topics = [user_topic(current_user.id)] + [product_topic(p.id) for p in current_user.tracked_products]
+    sub = event_bus.subscribe(topics)
+    if sub is None:
+        retry_after = current_app.config.get('SSE_RETRY_AFTER', 60)
+        response = jsonify({'error': 'too many live connections', 'poll': url_for('main.api_alerts')})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    return Response(sse_stream(event_bus, sub, current_app.config.get('SSE_MAX_LIFETIME', 300)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # ──── REST API ─────────────────────────────────────────────────────────────
+PRODUCT_FIELDS = ('id', 'name', 'url', 'image', 'current_price', 'tracked_since',
+                  'lowest_ever', 'highest_ever', 'price_checks')
+PRODUCT_STATS_FIELDS = {'lowest_ever', 'highest_ever', 'price_checks'}
+PRICE_FIELDS = ('id', 'product_id', 'price', 'checked_at')
+ALERT_FIELDS = ('id', 'product_id', 'message', 'type', 'severity', 'is_read', 'repeat_count', 'created_at')
+
+
+@bp.errorhandler(PaginationError)
+def pagination_error(e):
+    return jsonify({'error': str(e)}), 400
+
+
 @bp.route('/api/products')
 @login_required
+@conditional(_user_scope)
 def api_products():
-    """REST — list all tracked products for the current user."""
-    return jsonify([p.to_dict() for p in current_user.tracked_products])
+    """
+    REST — the current user's tracked products, by id.
+    Query: limit (≤200), cursor, since/until (when this user started tracking), fields.
+    History stats are one aggregate query over the page, only if requested.
+    """
+    limit = parse_limit(request.args, 50, 200)
+    fields = parse_fields(request.args, PRODUCT_FIELDS, PRODUCT_FIELDS)
+    since, until = parse_time(request.args, 'since'), parse_time(request.args, 'until')
+
+    # rows tracked before added_at existed fall back to when the product was first added
+    tracked_since = db.func.coalesce(user_products.c.added_at, Product.created_at)
+    query = (db.select(Product.id, Product.product_name, Product.url, Product.image_url,
+                       Product.last_price, tracked_since.label('tracked_since'))
+             .join(user_products, user_products.c.product_id == Product.id)
+             .where(user_products.c.user_id == current_user.id)
+             .order_by(Product.id)
+             .limit(limit + 1))
+    if request.args.get('cursor'):
+        (last_id,) = decode_cursor(request.args['cursor'], int)
+        query = query.where(Product.id > last_id)
+    if since:
+        query = query.where(tracked_since >= since)
+    if until:
+        query = query.where(tracked_since < until)
+    rows = db.session.execute(query).all()
+
+    stats = {}
+    if PRODUCT_STATS_FIELDS.intersection(fields) and rows:
+        stats = history_store.stats([r.id for r in rows[:limit]])
+
+    def serialize(r):
+        lowest, highest, checks = stats.get(r.id, (None, None, 0))
+        item = {
+            'id': r.id,
+            'name': r.product_name or "Fetching details…",
+            'url': r.url,
+            'image': r.image_url,
+            'current_price': r.last_price,
+            'tracked_since': r.tracked_since.strftime('%d %b %Y'),
+            'lowest_ever': lowest,
+            'highest_ever': highest,
+            'price_checks': checks,
+        }
+        return {f: item[f] for f in fields}
+
+    return jsonify(page(rows, limit, lambda r: encode_cursor(r.id), serialize))
 
 
 @bp.route('/api/prices/<int:product_id>')
 @login_required
+@_tracked_product_required
+@conditional(lambda product_id: (None, [product_id]))
 def api_prices(product_id):
-    """REST — price history for a given product."""
-    history = PriceHistory.query.filter_by(product_id=product_id)\
-                                .order_by(PriceHistory.checked_at.asc()).all()
-    return jsonify([h.to_dict() for h in history])
+    """
+    REST — price history for a given product, oldest first (order=desc for newest first).
+    Query: limit (≤5000), cursor, since/until, fields.
+    """
+    limit = parse_limit(request.args, 1000, 5000)
+    fields = parse_fields(request.args, PRICE_FIELDS, PRICE_FIELDS)
+    since, until = parse_time(request.args, 'since'), parse_time(request.args, 'until')
+    descending = request.args.get('order') == 'desc'
+
+    cursor = decode_cursor(request.args['cursor'], datetime, int) if request.args.get('cursor') else None
+    rows = history_store.page(product_id, limit + 1, since, until, descending, cursor)
+
+    def serialize(r):
+        item = {'id': r.id, 'product_id': r.product_id, 'price': r.price, 'checked_at': r.checked_at.isoformat()}
+        return {f: item[f] for f in fields}
+
+    return jsonify(page(rows, limit, lambda r: encode_cursor(r.checked_at, r.id), serialize))
 
 
 @bp.route('/api/alerts')
 @login_required
+@conditional(lambda: (current_user.id, ()))
 def api_alerts():
-    """REST — unread notifications for the current user."""
-    notifs = current_user.notifications.order_by(Notification.created_at.desc()).limit(20).all()
-    return jsonify([{
-        'id': n.id,
-        'message': n.message,
-        'type': n.type,
-        'severity': n.severity,
-        'is_read': n.is_read,
-        'created_at': n.created_at.isoformat()
-    } for n in notifs])
+    """
+    REST — the current user's notifications, newest first.
+    Query: limit (≤200), cursor, since/until, unread=1, fields.
+    """
+    limit = parse_limit(request.args, 20, 200)
+    fields = parse_fields(request.args, ALERT_FIELDS, ALERT_FIELDS)
+    since, until = parse_time(request.args, 'since'), parse_time(request.args, 'until')
+
+    key = (Notification.created_at, Notification.id)
+    query = (db.select(Notification)
+             .where(Notification.user_id == current_user.id)
+             .order_by(*(k.desc() for k in key))
+             .limit(limit + 1))
+    if request.args.get('cursor'):
+        query = query.where(after(key, decode_cursor(request.args['cursor'], datetime, int), descending=True))
+    if since:
+        query = query.where(Notification.created_at >= since)
+    if until:
+        query = query.where(Notification.created_at < until)
+    if request.args.get('unread') == '1':
+        query = query.where(Notification.is_read.is_(False))
+    rows = db.session.execute(query).scalars().all()
+
+    def serialize(n):
+        item = {
+            'id': n.id,
+            'product_id': n.product_id,
+            'message': n.message,
+            'type': n.type,
+            'severity': n.severity,
+            'is_read': n.is_read,
+            'repeat_count': n.repeat_count or 1,
+            'created_at': n.created_at.isoformat()
+        }
+        return {f: item[f] for f in fields}
+
+    return jsonify(page(rows, limit, lambda n: encode_cursor(n.created_at, n.id), serialize))
 
 
 @bp.route('/api/predict/<int:product_id>')
@@ -251,25 +445,26 @@ def api_predict(product_id):
 
 
 # ──── Export ───────────────────────────────────────────────────────────────
-@bp.route('/export/csv')
+@bp.route('/export/csv', defaults={'fmt': 'csv'})
+@bp.route('/export/<any(csv, ndjson):fmt>')
 @login_required
-def export_csv():
-    """Download a CSV of the user's tracked products and latest prices."""
-    import csv, io
-    from flask import Response
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Product', 'URL', 'Current Price', 'Lowest Ever', 'Added At'])
-
-    for p in current_user.tracked_products:
-        prices = [h.price for h in p.history]
-        lowest = min(prices) if prices else p.last_price
-        writer.writerow([p.product_name, p.url, p.last_price, lowest, p.created_at.strftime('%Y-%m-%d')])
+def export_data(fmt):
+    """
+    Download the user's tracked products and latest prices as CSV or NDJSON,
+    or with history=1 every price check (optionally since/until). Streamed.
+    """
+    from flask import Response, stream_with_context
+    from app.services.export import FORMATS, SUMMARY_COLUMNS, HISTORY_COLUMNS, summary_rows, history_rows, stream
+
+    chunk = current_app.config.get('EXPORT_CHUNK', 1000)
+    if request.args.get('history') == '1':
+        since, until = parse_time(request.args, 'since'), parse_time(request.args, 'until')
+        columns, rows, name = HISTORY_COLUMNS, history_rows(current_user.id, chunk, since, until), 'price_history'
+    else:
+        columns, rows, name = SUMMARY_COLUMNS, summary_rows(current_user.id), 'report'
 
-    output.seek(0)
-    return Response(output, mimetype='text/csv',
-                    headers={'Content-Disposition': 'attachment;filename=pricetracker_report.csv'})
+    return Response(stream_with_context(stream(fmt, columns, rows, chunk)), mimetype=FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment;filename=pricetracker_{name}.{fmt}'})
 
 
 # ──── Profile & Settings ────────────────────────────────────────────────────
@@ -313,6 +508,7 @@ def update_profile():
             db.session.commit()
             flash('Password changed successfully!', 'success')
 
+    data_versions.bump_users([current_user.id])
     return redirect(url_for('main.profile'))
 
 
@@ -330,19 +526,23 @@ def delete_account():
 # ──── Product Detail ───────────────────────────────────────────────────────
 @bp.route('/product/<int:product_id>')
 @login_required
+@conditional(lambda product_id: (current_user.id, [product_id]))
 def product_detail(product_id):
     product = Product.query.get_or_404(product_id)
     if product not in current_user.tracked_products:
         flash('Product not found in your list.', 'danger')
         return redirect(url_for('main.index'))
 
-    history = PriceHistory.query.filter_by(product_id=product.id)\
-                                .order_by(PriceHistory.checked_at.asc()).all()
-    prices  = [h.price for h in history if h.price is not None]
-    labels  = [h.checked_at.strftime('%d %b %H:%M') for h in history if h.price is not None]
+    # Chart and stats from the series arrays; the table only gets the newest page
+    times, prices = series_store.series(product.id)
+    chart = lttb(times.tolist(), prices.tolist(), current_app.config.get('CHART_POINTS', 300))
+    table_rows = current_app.config.get('HISTORY_TABLE_ROWS', 50)
+    history_rows = history_store.page(product.id, table_rows + 1, descending=True)
+    next_cursor = (encode_cursor(history_rows[table_rows - 1].checked_at, history_rows[table_rows - 1].id)
+                   if len(history_rows) > table_rows else None)
 
-    curr = prices[-1] if prices else product.last_price
-    prev = prices[-2] if len(prices) >= 2 else curr
+    curr = round(float(prices[-1]), 2) if len(prices) else product.last_price
+    prev = round(float(prices[-2]), 2) if len(prices) >= 2 else curr
     trend = 'down' if (curr and prev and curr < prev) else ('up' if (curr and prev and curr > prev) else 'flat')
 
     p_data = {
@@ -351,12 +551,13 @@ def product_detail(product_id):
         'url':           product.url,
         'image':         product.image_url,
         'current_price': curr,
-        'lowest':        min(prices) if prices else None,
-        'highest':       max(prices) if prices else None,
-        'avg':           round(sum(prices)/len(prices), 0) if prices else None,
+        'lowest':        round(float(prices.min()), 2) if len(prices) else None,
+        'highest':       round(float(prices.max()), 2) if len(prices) else None,
+        'avg':           round(float(prices.mean(dtype=np.float64)), 0) if len(prices) else None,
         'trend':         trend,
-        'history_points': prices,
-        'history_labels': labels,
+        'check_count':   len(prices),
+        'history_points': [round(float(prices[i]), 2) for i in chart],
+        'history_labels': [_utc(times[i]).strftime('%d %b %H:%M') for i in chart],
     }
 
     # AI Prediction
@@ -377,7 +578,9 @@ def product_detail(product_id):
 
     return render_template('product_detail.html',
                            p=p_data,
-                           history_rows=list(reversed(history)),
+                           history_rows=history_rows,
+                           table_rows=table_rows,
+                           next_cursor=next_cursor,
                            prediction=prediction,
                            target_price=target_price)
 
@@ -398,6 +601,7 @@ def set_target_price(product_id):
             {'tp': tp, 'u': current_user.id, 'p': product_id}
         )
         db.session.commit()
+        data_versions.bump_users([current_user.id])
         flash(f'Target price set to ₹{tp:,.0f}. You\'ll get an email when it hits that price!', 'success')
     except Exception as e:
         flash('Invalid price.', 'danger')
@@ -0,0 +1,76 @@
+"""
+Alert Rules.
+In-memory index of every tracker's alert rule, loaded once per check run.
+Per product, trackers are kept sorted by target price and by drop
+threshold (min_drop_alert_pct), so a new price finds exactly the users
+whose rules fire with two binary searches instead of scanning all trackers.
+Same rule as the SQL fan-out in tasks._alert_rule.
+"""
+from bisect import bisect_left, bisect_right
+from app.models.models import db, User, user_products
+from app.email.digest import KIND_DROP, KIND_TARGET
+
+DEFAULT_MIN_DROP_PCT = 1.0
+
+
+class ProductRules:
+    """Sorted (target_price, user_id) and (min_drop_pct, user_id) lists for one product."""
+
+    __slots__ = ('targets', 'thresholds')
+
+    def __init__(self, targets: list, thresholds: list):
+        self.targets = sorted(targets)
+        self.thresholds = sorted(thresholds)
+
+    def matches(self, old_price: float, new_price: float, drop_pct: float) -> dict:
+        """{user_id: kind} for a drop from old_price to new_price."""
+        hits = {}
+        # targets crossed by this drop: new_price <= target < old_price
+        lo = bisect_left(self.targets, (new_price,))
+        hi = bisect_left(self.targets, (old_price,))
+        for _, user_id in self.targets[lo:hi]:
+            hits[user_id] = KIND_TARGET
+        # thresholds met: min_drop_pct <= drop_pct
+        for _, user_id in self.thresholds[:bisect_right(self.thresholds, (drop_pct, float('inf')))]:
+            hits.setdefault(user_id, KIND_DROP)
+        return hits
+
+
+class AlertRuleIndex:
+    """Alert rules for a set of products plus each tracker's (email, name)."""
+
+    def __init__(self):
+        self._rules = {}      # product_id -> ProductRules
+        self._users = {}      # user_id -> (email, name)
+
+    @classmethod
+    def load(cls, product_ids=None):
+        """Builds the index with one query over user_products ⋈ users."""
+        query = (db.select(user_products.c.product_id, user_products.c.user_id, user_products.c.target_price,
+                           User.min_drop_alert_pct, User.email, User.name)
+                 .join_from(user_products, User, User.id == user_products.c.user_id))
+        if product_ids is not None:
+            query = query.where(user_products.c.product_id.in_(product_ids))
+
+        targets, thresholds = {}, {}
+        index = cls()
+        for product_id, user_id, target, min_pct, email, name in db.session.execute(query):
+            index._users[user_id] = (email, name)
+            if target:
+                targets.setdefault(product_id, []).append((target, user_id))
+            pct = DEFAULT_MIN_DROP_PCT if min_pct is None else min_pct
+            thresholds.setdefault(product_id, []).append((pct, user_id))
+
+        for product_id in thresholds:
+            index._rules[product_id] = ProductRules(targets.get(product_id, []), thresholds[product_id])
+        return index
+
+    def matches(self, product_id: int, old_price: float, new_price: float, drop_pct: float) -> dict:
+        rules = self._rules.get(product_id)
+        if rules is None or new_price >= old_price:
+            return {}
+        return rules.matches(old_price, new_price, drop_pct)
+
+    def user(self, user_id: int) -> tuple:
+        """(email, name) of a tracker in the index."""
+        return self._users.get(user_id, (None, None))
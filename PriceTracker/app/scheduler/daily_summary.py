@@ -0,0 +1,135 @@
+"""
+Daily Summary Job.
+Emails every user a summary of their tracked products once a day.
+Trends for all products come from one aggregate query per history
+partition; users are then walked in id order in fixed-size batches
+(keyset pagination), with one query per batch for their products and one
+bulk insert into the email outbox. Memory stays proportional to the product count plus one batch.
+
+Each day's round starts where the previous one stopped and wraps around,
+so a run cut short by DAILY_SUMMARY_MAX_SECONDS does not starve the
+highest user ids. The position is saved in job_cursors in the same commit
+as each batch's outbox rows, and a later run the same day resumes the round.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+from app.models.models import db, User, Product, JobCursor, user_products
+from app.services.history_store import history_store
+from app.email.email_service import EmailService
+from app.email import outbox
+
+logger = logging.getLogger(__name__)
+
+MAX_PRODUCTS_PER_EMAIL = 50
+CURSOR = 'daily_summary'
+
+
+def _prices_at(since: datetime) -> dict:
+    """{product_id: last recorded price before `since`} for every product that has a price."""
+    priced = db.session.execute(db.select(Product.id).where(Product.last_price.isnot(None))).scalars().all()
+    return history_store.prices_before(since, priced)
+
+
+def _trend(current, previous) -> str:
+    if current is None or previous is None or current == previous:
+        return 'flat'
+    return 'down' if current < previous else 'up'
+
+
+def _user_batches(batch_size: int, after_id: int = 0, upto_id: int = None):
+    """Yields lists of (id, email, name) with after_id < id (<= upto_id), walking users by primary key."""
+    last_id = after_id
+    while True:
+        query = db.select(User.id, User.email, User.name).where(User.id > last_id)
+        if upto_id is not None:
+            query = query.where(User.id <= upto_id)
+        batch = db.session.execute(query.order_by(User.id).limit(batch_size)).all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def _round(day: str) -> JobCursor:
+    """Today's cursor: unchanged if today's round has begun, else a new round from where the last one stopped."""
+    cursor = db.session.get(JobCursor, CURSOR)
+    if cursor is None:
+        cursor = JobCursor(name=CURSOR, day=day, start_id=0, last_id=0, complete=False)
+        db.session.add(cursor)
+    elif cursor.day != day:
+        start = 0 if cursor.complete else cursor.last_id
+        cursor.day, cursor.start_id, cursor.last_id, cursor.complete = day, start, start, False
+    return cursor
+
+
+def _due_batches(cursor: JobCursor, batch_size: int):
+    """User batches left in the cursor's round: ids above start_id, then wrapping round to start_id."""
+    if cursor.last_id >= cursor.start_id:
+        yield from _user_batches(batch_size, cursor.last_id)
+        yield from _user_batches(batch_size, 0, cursor.start_id)
+    else:
+        yield from _user_batches(batch_size, cursor.last_id, cursor.start_id)
+
+
+def build_daily_summaries(user_batches):
+    """
+    Yields (last user id, [(email, subject, html)]) per batch of `user_batches`.
+    Users without tracked products are skipped.
+    """
+    previous_prices = _prices_at(datetime.utcnow() - timedelta(days=1))
+
+    for users in user_batches:
+        products_by_user = {}
+        rows = db.session.execute(
+            db.select(user_products.c.user_id, Product.id, Product.product_name, Product.last_price)
+            .join(Product, Product.id == user_products.c.product_id)
+            .where(user_products.c.user_id.in_([u.id for u in users]))
+            .order_by(user_products.c.user_id, Product.id)
+        )
+        for user_id, product_id, name, price in rows:
+            items = products_by_user.setdefault(user_id, [])
+            if len(items) < MAX_PRODUCTS_PER_EMAIL:
+                items.append({
+                    'name': name or 'Fetching details…',
+                    'current_price': price,
+                    'trend': _trend(price, previous_prices.get(product_id)),
+                })
+
+        messages = []
+        for user in users:
+            products_data = products_by_user.get(user.id)
+            if products_data:
+                subject, html = EmailService.render_daily_summary(user.name, products_data)
+                messages.append((user.email, subject, html))
+        yield users[-1].id, messages
+
+
+def send_daily_summaries(app):
+    """Scheduler job: queues every user's daily summary in the email outbox."""
+    with app.app_context():
+        if not outbox.smtp_configured():
+            logger.warning("Daily summary skipped — email is not configured.")
+            return
+        started = time.monotonic()
+        cursor = _round(datetime.utcnow().strftime('%Y-%m-%d'))
+        if cursor.complete:
+            logger.info("📊 Daily summary: already sent today.")
+            return
+        db.session.commit()
+
+        queued = 0
+        max_seconds = app.config.get('DAILY_SUMMARY_MAX_SECONDS', 1800)
+        batches = _due_batches(cursor, app.config.get('DAILY_SUMMARY_BATCH', 1000))
+        for last_id, messages in build_daily_summaries(batches):
+            queued += outbox.enqueue_many(messages)
+            cursor.last_id = last_id
+            cursor.complete = last_id == cursor.start_id     # wrapped back round to the start
+            db.session.commit()
+            if max_seconds and time.monotonic() - started > max_seconds and not cursor.complete:
+                logger.warning(f"Daily summary: time budget hit after user {last_id}, resuming there next run")
+                break
+        else:
+            cursor.complete = True
+            db.session.commit()
+        logger.info(f"📊 Daily summary: queued {queued} emails in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,133 @@
+"""
+Price-check Jobs.
+Runs check_prices() on a background thread on behalf of a user
+(their own products) or an admin (everything), and tracks progress so the
+HTTP request can return a job id immediately.
+"""
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCOPE_ALL = 'all'
+KEEP_FINISHED = 3600   # seconds a finished job stays queryable
+
+
+class CheckJob:
+    """Progress of one background price-check run."""
+
+    def __init__(self, scope: str, owner_id: int = None, product_ids=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.scope = scope
+        self.owner_id = owner_id
+        self.product_ids = set(product_ids) if product_ids is not None else None   # None = every product
+        self.status = 'queued'          # queued, running, done, error
+        self.total = 0
+        self.done = 0
+        self.failures = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    # ── progress callbacks used by check_prices ──────────────────────────────
+    def start(self, total: int):
+        with self._lock:
+            self.status = 'running'
+            self.total = total
+            self.started_at = time.time()
+
+    def advance(self, ok: bool = True):
+        with self._lock:
+            self.done += 1
+            if not ok:
+                self.failures += 1
+
+    def finish(self, error: str = None):
+        with self._lock:
+            self.status = 'error' if error else 'done'
+            self.error = error
+            self.finished_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'error')
+
+    def eta_seconds(self):
+        if not self.started_at or not self.done or self.finished:
+            return None
+        per_item = (time.time() - self.started_at) / self.done
+        return round(per_item * (self.total - self.done), 1)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'scope': self.scope,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'failures': self.failures,
+            'eta_seconds': self.eta_seconds(),
+            'error': self.error,
+        }
+
+
+class JobRegistry:
+    """
+    Keeps jobs by id and at most one unfinished job per scope. Triggering a
+    scope that is already running returns the running job instead of
+    starting another; a user-scoped trigger also joins a running global job,
+    since that already covers the user's products. A global job started
+    while user jobs run leaves their products to them.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._active = {}     # scope -> job
+        self._lock = threading.Lock()
+
+    def submit(self, scope: str, product_ids=None, owner_id: int = None):
+        """Returns (job, created)."""
+        from app.scheduler.tasks import check_prices
+
+        with self._lock:
+            self._prune()
+            for s in (scope, SCOPE_ALL):
+                job = self._active.get(s)
+                if job is not None and not job.finished:
+                    return job, False
+
+            skip_ids = set()
+            if product_ids is None:
+                for other in self._active.values():
+                    if not other.finished and other.product_ids is not None:
+                        skip_ids |= other.product_ids
+
+            job = CheckJob(scope, owner_id, product_ids)
+            self._jobs[job.id] = job
+            self._active[scope] = job
+
+        def run():
+            try:
+                check_prices(product_ids=product_ids, progress=job, skip_ids=skip_ids)
+                job.finish()
+            except Exception as e:
+                logger.error(f"Check job {job.id} failed: {e}")
+                job.finish(str(e))
+
+        threading.Thread(target=run, name=f'check-{job.id}', daemon=True).start()
+        return job, True
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - KEEP_FINISHED
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+check_jobs = JobRegistry()
@@ -0,0 +1,130 @@
+"""
+Notification Retention.
+Keeps the notifications table small:
+  1. collapses repeated error notifications for the same user + product
+     into the newest row, adding up their repeat_count;
+  2. moves (or deletes) read notifications older than
+     NOTIFICATION_RETENTION_DAYS into notifications_archive.
+With partitioned price history it also moves rows left in the main
+price_history table into month files, drops months older than
+HISTORY_RETENTION_MONTHS and deletes month-file rows of products that no
+longer exist.
+Work is done in batches of RETENTION_BATCH rows, each in its own short
+transaction, so the job never holds the SQLite write lock for long.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, delete, update
+from app.models.models import db, Notification, NotificationArchive
+from app.services.notification_cache import notification_cache
+from app.services.data_version import data_versions
+from app.services.history_store import history_store
+
+logger = logging.getLogger(__name__)
+
+PAUSE_BETWEEN_BATCHES = 0.05   # seconds; lets web requests take the write lock
+
+
+def compact_errors(batch_size: int) -> int:
+    """
+    Collapses duplicate error rows per (user, product, read state) into the
+    newest one. Deletes at most `batch_size` rows per transaction, however
+    large a single group's backlog is. Returns rows removed.
+    """
+    removed = 0
+    keepers = (db.select(Notification.user_id, Notification.product_id, Notification.is_read,
+                         func.max(Notification.id).label('keep_id'))
+               .where(Notification.type == 'error', Notification.product_id.isnot(None))
+               .group_by(Notification.user_id, Notification.product_id, Notification.is_read)
+               .having(func.count() > 1)
+               .subquery())
+    while True:
+        rows = db.session.execute(
+            db.select(Notification.id, keepers.c.keep_id, func.coalesce(Notification.repeat_count, 1))
+            .join(keepers, (Notification.user_id == keepers.c.user_id)
+                  & (Notification.product_id == keepers.c.product_id)
+                  & (Notification.is_read == keepers.c.is_read))
+            .where(Notification.type == 'error', Notification.id != keepers.c.keep_id)
+            .order_by(Notification.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return removed
+
+        extra = {}
+        for _, keep_id, count in rows:
+            extra[keep_id] = extra.get(keep_id, 0) + count
+        for keep_id, count in extra.items():
+            db.session.execute(update(Notification).where(Notification.id == keep_id)
+                               .values(repeat_count=func.coalesce(Notification.repeat_count, 1) + count))
+        removed += db.session.execute(
+            delete(Notification).where(Notification.id.in_([r[0] for r in rows]))
+        ).rowcount
+        db.session.commit()
+        time.sleep(PAUSE_BETWEEN_BATCHES)
+
+
+def purge_read(days: int, batch_size: int, archive: bool = True) -> int:
+    """Archives (or just deletes) read notifications older than `days`. Returns rows moved."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            db.select(Notification.id)
+            .where(Notification.is_read.is_(True), Notification.created_at < cutoff)
+            .order_by(Notification.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return moved
+
+        if archive:
+            db.session.execute(insert(NotificationArchive).from_select(
+                ['notification_id', 'user_id', 'product_id', 'message', 'type', 'severity', 'repeat_count', 'created_at'],
+                db.select(Notification.id, Notification.user_id, Notification.product_id, Notification.message,
+                          Notification.type, Notification.severity, Notification.repeat_count,
+                          Notification.created_at)
+                .where(Notification.id.in_(ids))
+            ))
+        db.session.execute(delete(Notification).where(Notification.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+        time.sleep(PAUSE_BETWEEN_BATCHES)
+
+
+def migrate_history(batch_size: int) -> int:
+    """Moves legacy price_history rows into month partitions. Returns rows moved."""
+    moved = 0
+    while True:
+        n = history_store.migrate_legacy(batch_size)
+        moved += n
+        if n < batch_size:
+            return moved
+        time.sleep(PAUSE_BETWEEN_BATCHES)
+
+
+def run_retention(app):
+    """Scheduler job: compaction, then archival of old read notifications, then history partitions."""
+    with app.app_context():
+        started = time.monotonic()
+        batch_size = app.config.get('RETENTION_BATCH', 500)
+        compacted = compact_errors(batch_size)
+        purged = purge_read(app.config.get('NOTIFICATION_RETENTION_DAYS', 30), batch_size,
+                            archive=app.config.get('NOTIFICATION_ARCHIVE', True))
+        if compacted or purged:
+            notification_cache.invalidate()
+            data_versions.bump_all()
+        logger.info(f"🧹 Retention: collapsed {compacted} duplicate errors, "
+                    f"{'archived' if app.config.get('NOTIFICATION_ARCHIVE', True) else 'deleted'} {purged} "
+                    f"read notifications in {time.monotonic() - started:.1f}s")
+
+        if history_store.partitioned:
+            moved = migrate_history(batch_size)
+            keep = app.config.get('HISTORY_RETENTION_MONTHS', 0)
+            dropped = history_store.drop_before(keep) if keep > 0 else []
+            orphans = history_store.purge_orphans()
+            if moved or dropped or orphans:
+                data_versions.bump_all()
+                logger.info(f"🧹 History: moved {moved} rows into month files, dropped {dropped or 'no months'}, "
+                            f"removed {orphans} rows of deleted products")
@@ -0,0 +1,88 @@
+"""
+Background Scrape Queue.
+A small priority queue drained by daemon worker threads, so HTTP requests
+can hand scraping off instead of waiting on the retailer.
+"""
+import itertools
+import logging
+import queue
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0      # first scrape of a newly added product
+PRIORITY_NORMAL = 10   # routine re-checks
+MAX_FAILED = 1000      # failed keys remembered for status(); the oldest are forgotten
+
+
+class ScrapeQueue:
+    """
+    Priority queue of (priority, seq, key, fn) work items. A key that is
+    already queued or running is not queued twice.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._state = {}          # key -> 'queued' | 'running'
+        self._failed = OrderedDict()   # keys whose last run reported failure, oldest first
+        self._lock = threading.Lock()
+        self._app = None
+        self._threads = []
+
+    def start(self, app):
+        """Starts the worker threads (idempotent). `app` provides the app context."""
+        with self._lock:
+            if self._threads:
+                return
+            self._app = app
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f'scrape-worker-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+        app.logger.info(f"Scrape queue started with {self.workers} workers.")
+
+    def enqueue(self, key, fn, priority: int = PRIORITY_NORMAL) -> bool:
+        """
+        Queues fn() to run inside the app context. fn returns True on success.
+        Returns False if the key is already queued or running.
+        """
+        with self._lock:
+            if key in self._state:
+                return False
+            self._state[key] = 'queued'
+            self._failed.pop(key, None)
+        self._queue.put((priority, next(self._seq), key, fn))
+        return True
+
+    def status(self, key):
+        """'queued', 'running', 'failed' or None (never queued / finished OK)."""
+        with self._lock:
+            if key in self._state:
+                return self._state[key]
+            return 'failed' if key in self._failed else None
+
+    def _run(self):
+        while True:
+            _, _, key, fn = self._queue.get()
+            with self._lock:
+                self._state[key] = 'running'
+            ok = False
+            try:
+                with self._app.app_context():
+                    ok = fn()
+            except Exception as e:
+                logger.error(f"Scrape queue: job {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._state.pop(key, None)
+                    if not ok:
+                        self._failed[key] = True
+                        if len(self._failed) > MAX_FAILED:
+                            self._failed.popitem(last=False)
+                self._queue.task_done()
+
+
+scrape_queue = ScrapeQueue()
@@ -1,7 +1,14 @@
 import logging
-from app.models.models import db, Product, PriceHistory, Notification, User, user_products
-from app.scraper.product_scraper import ProductScraper
-from app.email.email_service import EmailService
+from datetime import datetime
+from sqlalchemy import insert, update, literal, and_, or_, func
+from app.models.models import db, Product, Notification, User, user_products
+from app.scraper.scrape_cache import fetch_product_details
+from app.email.digest import AlertDigest
+from app.scheduler.alert_rules import AlertRuleIndex
+from app.services.notification_cache import notification_cache
+from app.services.events import event_bus, user_topic, product_topic
+from app.services.data_version import data_versions
+from app.services.history_store import history_store
 
 logger = logging.getLogger(__name__)
 
@@ -12,10 +19,100 @@ def _classify_severity(drop_pct: float) -> str:
     return 'normal'
 
 
-def check_prices():
+def _alert_rule(old_price: float, new_price: float, drop_pct: float):
     """
-    Background job: iterates all tracked products, scrapes fresh prices,
-    updates history, detects drops, and fires email + in-app notifications.
+    SQL condition (over user_products ⋈ users) for trackers who want this drop:
+    it crossed their target price, or it is at least their min_drop_alert_pct.
+    Must match alert_rules.ProductRules, which picks the email recipients.
+    """
+    target = user_products.c.target_price
+    return or_(
+        and_(target.isnot(None), target >= new_price, target < old_price),
+        func.coalesce(User.min_drop_alert_pct, 1.0) <= drop_pct,
+    )
+
+
+def _fan_out(product_id: int, message: str, type_: str,
+             severity: str = Notification.SEVERITY_NORMAL, rule=None, recipients=None,
+             collapse: bool = False) -> int:
+    """
+    Creates one Notification per user tracking `product_id` with a single
+    INSERT … SELECT from user_products, optionally narrowed by `rule`.
+    Commits (with anything else pending), drops the trackers' cached
+    notification counts and pushes the notification to their live event
+    streams — to `recipients` (the users `rule` selects) if given.
+    With `collapse`, a tracker who still has an unread notification of this
+    type for the product gets that row's repeat_count bumped instead of a
+    new row. Returns the number of notifications created.
+    """
+    trackers = (db.select(user_products.c.user_id, literal(product_id), literal(message),
+                          literal(type_), literal(severity), literal(False), literal(datetime.utcnow()))
+                .where(user_products.c.product_id == product_id))
+    if collapse:
+        now = datetime.utcnow()
+        unread = and_(Notification.product_id == product_id, Notification.type == type_,
+                      Notification.is_read.is_(False))
+        db.session.execute(
+            update(Notification)
+            .where(unread, Notification.user_id.in_(
+                db.select(user_products.c.user_id).where(user_products.c.product_id == product_id)))
+            .values(repeat_count=func.coalesce(Notification.repeat_count, 1) + 1, message=message, created_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        trackers = trackers.where(~db.select(Notification.id)
+                                  .where(unread, Notification.user_id == user_products.c.user_id).exists())
+    if rule is not None:
+        trackers = trackers.join_from(user_products, User, User.id == user_products.c.user_id).where(rule)
+    result = db.session.execute(insert(Notification).from_select(
+        ['user_id', 'product_id', 'message', 'type', 'severity', 'is_read', 'created_at'], trackers))
+    db.session.commit()
+    tracker_ids = notification_cache.invalidate_product(product_id)
+    data_versions.bump_users(tracker_ids)
+    event = {'product_id': product_id, 'message': message, 'type': type_,
+             'severity': severity, 'created_at': datetime.utcnow().isoformat()}
+    for user_id in (tracker_ids if recipients is None else recipients):
+        event_bus.publish(user_topic(user_id), 'notification', event)
+    return result.rowcount
+
+
+def first_scrape(product_id: int) -> bool:
+    """
+    Scrape-queue job: fetches name, image and price for a newly added product
+    and tells the users tracking it. Returns False if the fetch failed
+    (the next scheduled check will retry).
+    """
+    product = db.session.get(Product, product_id)
+    if product is None:
+        return True
+
+    details = fetch_product_details(product.url)
+
+    if not details or details.get('price') is None:
+        logger.warning(f"First scrape failed for {product.url}")
+        _fan_out(product.id, "Added product but price fetch failed. Will retry.", 'error', collapse=True)
+        return False
+
+    price = details['price']
+    product.product_name = product.product_name or details.get('name')
+    product.image_url = product.image_url or details.get('image_url')
+    product.last_price = price
+    history_store.record(product.id, price)
+    _fan_out(product.id, f"Now tracking \"{product.product_name or 'new product'}\" at ₹{price:,.0f}", 'info')
+    data_versions.bump_products([product.id])
+    event_bus.publish(product_topic(product.id), 'price', {'product_id': product.id, 'price': price, 'old_price': None})
+    logger.info(f"First scrape done for {product.product_name} ({price})")
+    return True
+
+
+def check_prices(product_ids=None, progress=None, skip_ids=None):
+    """
+    Background job: iterates all tracked products (or just `product_ids`),
+    scrapes fresh prices, updates history, detects drops, and fires
+    in-app notifications. Emails are collected per user and sent as one
+    digest when the run ends.
+
+    `progress` (a CheckJob) is told the total and each finished product.
+    Products in `skip_ids` are left out (another job is checking them).
     """
     logger.info("Scheduler: starting price check…")
 
@@ -23,79 +120,78 @@ def check_prices():
     app = create_app()
 
     with app.app_context():
-        products = Product.query.all()
+        query = Product.query
+        if product_ids is not None:
+            query = query.filter(Product.id.in_(product_ids))
+        if skip_ids:
+            query = query.filter(Product.id.notin_(skip_ids))
+        products = query.all()
+        if progress:
+            progress.start(len(products))
         if not products:
             logger.info("Scheduler: no products to check.")
             return
 
-        for product in products:
-            logger.info(f"Checking: {product.product_name or product.url}")
-
-            scraper = ProductScraper(product.url)
-            details = scraper.get_product_details()
-
-            if not details or details.get('price') is None:
-                logger.warning(f"Scheduler: price fetch failed for {product.url}")
-                # Notify every user tracking this product
-                rows = db.session.execute(
-                    user_products.select().where(user_products.c.product_id == product.id)
-                ).fetchall()
-                for row in rows:
-                    db.session.add(Notification(
-                        user_id=row.user_id,
-                        product_id=product.id,
-                        message=f"Scraping failed for \"{product.product_name or 'product'}\". Will retry.",
-                        type='error'
-                    ))
+        rules = AlertRuleIndex.load(product_ids)
+        digest = AlertDigest()
+        try:
+            for product in products:
+                logger.info(f"Checking: {product.product_name or product.url}")
+
+                details = fetch_product_details(product.url)
+
+                if not details or details.get('price') is None:
+                    logger.warning(f"Scheduler: price fetch failed for {product.url}")
+                    # Notify every user tracking this product
+                    _fan_out(product.id, f"Scraping failed for \"{product.product_name or 'product'}\". Will retry.", 'error', collapse=True)
+                    if progress:
+                        progress.advance(ok=False)
+                    continue
+
+                new_price = details['price']
+                if not product.product_name and details.get('name'):
+                    product.product_name = details['name']
+                if not product.image_url and details.get('image_url'):
+                    product.image_url = details['image_url']
+
+                old_price = product.last_price
+
+                # Save history
+                history_store.record(product.id, new_price)
+                product.last_price = new_price
                 db.session.commit()
-                continue
-
-            new_price = details['price']
-            if not product.product_name and details.get('name'):
-                product.product_name = details['name']
-            if not product.image_url and details.get('image_url'):
-                product.image_url = details['image_url']
-
-            old_price = product.last_price
-
-            # Save history
-            db.session.add(PriceHistory(product_id=product.id, price=new_price))
-            product.last_price = new_price
-            db.session.commit()
-
-            if old_price and new_price < old_price:
-                drop_pct = round((old_price - new_price) / old_price * 100, 1)
-                severity = _classify_severity(drop_pct)
-                emoji = '🚀' if severity == 'mega' else ('🔥' if severity == 'hot' else '📉')
-                logger.info(f"{emoji} DROP {drop_pct}% on {product.product_name}")
-
-                # Notify all users tracking this product
-                rows = db.session.execute(
-                    user_products.select().where(user_products.c.product_id == product.id)
-                ).fetchall()
-                for row in rows:
-                    db.session.add(Notification(
-                        user_id=row.user_id,
-                        product_id=product.id,
-                        message=f"{emoji} {product.product_name}: ₹{old_price:,.0f} → ₹{new_price:,.0f} ({drop_pct}% off)",
-                        type='drop',
-                        severity=severity
-                    ))
-
-                db.session.commit()
-
-                # Email the owner
-                with app.app_context():
-                    EmailService.send_price_drop_alert(
-                        product_name=product.product_name,
-                        old_price=old_price,
-                        new_price=new_price,
-                        url=product.url
-                    )
-
-            elif old_price and new_price > old_price:
-                logger.info(f"📈 RISE on {product.product_name}: {old_price} → {new_price}")
-            else:
-                logger.info(f"No change for {product.product_name} ({new_price})")
+                data_versions.bump_products([product.id])
+                if new_price != old_price:
+                    event_bus.publish(product_topic(product.id), 'price', {
+                        'product_id': product.id, 'price': new_price, 'old_price': old_price})
+
+                if old_price and new_price < old_price:
+                    drop_pct = round((old_price - new_price) / old_price * 100, 1)
+                    severity = _classify_severity(drop_pct)
+                    emoji = '🚀' if severity == 'mega' else ('🔥' if severity == 'hot' else '📉')
+                    logger.info(f"{emoji} DROP {drop_pct}% on {product.product_name}")
+
+                    # Notify the users whose target / drop threshold this meets…
+                    hits = rules.matches(product.id, old_price, new_price, drop_pct)
+                    _fan_out(product.id,
+                             f"{emoji} {product.product_name}: ₹{old_price:,.0f} → ₹{new_price:,.0f} ({drop_pct}% off)",
+                             'drop', severity, _alert_rule(old_price, new_price, drop_pct), recipients=list(hits))
+
+                    # …and email the same users
+                    for user_id, kind in hits.items():
+                        email, name = rules.user(user_id)
+                        digest.add(user_id, email, name, kind, product.product_name, product.url,
+                                   old_price, new_price, drop_pct, severity)
+
+                elif old_price and new_price > old_price:
+                    logger.info(f"📈 RISE on {product.product_name}: {old_price} → {new_price}")
+                else:
+                    logger.info(f"No change for {product.product_name} ({new_price})")
+
+                if progress:
+                    progress.advance()
+        finally:
+            digest.flush()
+            db.session.commit()     # the digest emails' outbox rows
 
         logger.info("Scheduler: price check complete.")
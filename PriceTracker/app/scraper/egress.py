@@ -0,0 +1,146 @@
+"""
+Egress Pool.
+Spreads scraper traffic over several proxies / local source addresses and
+keeps a per-domain health score for each, so throttled or slow exits are
+used less until they recover.
+"""
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+DIRECT = 'direct'
+
+
+class SourceAddressAdapter(HTTPAdapter):
+    """HTTPAdapter that binds outgoing sockets to a local IP address."""
+
+    def __init__(self, source_address: str, **kwargs):
+        self.source_address = (source_address, 0)
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['source_address'] = self.source_address
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['source_address'] = self.source_address
+        return super().proxy_manager_for(*args, **kwargs)
+
+
+class Egress:
+    """
+    One way out: a proxy URL ('http://host:port'), a local source address
+    ('local:10.0.0.5'), or the default route ('direct').
+    """
+
+    def __init__(self, spec: str = DIRECT):
+        self.id = spec
+        self.session = requests.Session()
+        if spec.startswith('local:'):
+            adapter = SourceAddressAdapter(spec[len('local:'):])
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+        elif spec != DIRECT:
+            self.session.proxies = {'http': spec, 'https': spec}
+        self.requests = 0
+        self.successes = 0
+        self.bytes = 0
+        self.started_at = time.time()
+
+
+class EgressHealth:
+    """EWMA success rate and latency of one egress against one domain."""
+    __slots__ = ('success', 'latency', 'failures_in_row', 'cooldown_until')
+
+    def __init__(self):
+        self.success = 1.0
+        self.latency = 1.0
+        self.failures_in_row = 0
+        self.cooldown_until = 0.0
+
+    def score(self) -> float:
+        return self.success ** 2 / (self.latency + 0.25)
+
+
+class EgressPool:
+    """Weighted-random egress selection by per-domain health, with cooldowns."""
+
+    def __init__(self, specs: list, alpha: float = 0.2, max_failures: int = 3, cooldown: float = 120.0):
+        self.egresses = [Egress(s) for s in specs] or [Egress()]
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _health_for(self, egress: Egress, domain: str) -> EgressHealth:
+        key = (egress.id, domain)
+        health = self._health.get(key)
+        if health is None:
+            health = self._health.setdefault(key, EgressHealth())
+        return health
+
+    def choose(self, domain: str, exclude: Egress = None) -> Egress:
+        now = time.monotonic()
+        candidates = [e for e in self.egresses if e is not exclude] or self.egresses
+        ready = [e for e in candidates if self._health_for(e, domain).cooldown_until <= now]
+        candidates = ready or candidates
+        if len(candidates) == 1:
+            return candidates[0]
+        weights = [self._health_for(e, domain).score() for e in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+    def record(self, egress: Egress, domain: str, ok: bool, elapsed: float, nbytes: int = 0):
+        with self._lock:
+            health = self._health_for(egress, domain)
+            health.success += self.alpha * ((1.0 if ok else 0.0) - health.success)
+            health.latency += self.alpha * (elapsed - health.latency)
+            egress.requests += 1
+            egress.bytes += nbytes
+            if ok:
+                egress.successes += 1
+                health.failures_in_row = 0
+            else:
+                health.failures_in_row += 1
+                if health.failures_in_row >= self.max_failures:
+                    health.cooldown_until = time.monotonic() + self.cooldown
+                    health.failures_in_row = 0
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        report = {}
+        for e in self.egresses:
+            elapsed = max(time.time() - e.started_at, 1e-6)
+            report[e.id] = {
+                'requests': e.requests,
+                'successes': e.successes,
+                'bytes': e.bytes,
+                'requests_per_min': round(e.requests / elapsed * 60, 2),
+                'kb_per_s': round(e.bytes / elapsed / 1024, 2),
+                'domains': {
+                    domain: {
+                        'success_rate': round(h.success, 3),
+                        'latency_s': round(h.latency, 3),
+                        'cooling_down': h.cooldown_until > now,
+                    }
+                    for (eid, domain), h in self._health.items() if eid == e.id
+                },
+            }
+        return report
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_egress_pool() -> EgressPool:
+    """Process-wide pool built from Config.SCRAPER_EGRESS on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from config import Config
+                _pool = EgressPool(Config.SCRAPER_EGRESS)
+    return _pool
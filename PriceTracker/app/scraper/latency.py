@@ -0,0 +1,141 @@
+"""
+Latency tracking for the scraper.
+Keeps a log-bucketed latency histogram per domain and uses it to pick
+per-phase deadlines and the delay after which a slow request is hedged.
+"""
+import bisect
+import threading
+from urllib.parse import urlparse
+
+# Bucket upper bounds in seconds, roughly 25% apart from 50ms to 60s
+BUCKET_BOUNDS = [round(0.05 * 1.25 ** i, 3) for i in range(33)]
+
+# Ceilings per phase (seconds). Domain entries override "default".
+DEADLINES = {
+    'default':      {'connect': 5, 'first_byte': 8, 'total': 15},
+    'amazon.in':    {'connect': 4, 'first_byte': 8, 'total': 12},
+    'flipkart.com': {'connect': 4, 'first_byte': 8, 'total': 12},
+}
+
+HEDGING_ENABLED = True
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20     # don't hedge until the histogram means something
+MAX_HEDGE_RATIO = 0.1      # at most 1 hedged request per 10 requests
+
+
+def domain_of(url: str) -> str:
+    """'https://www.amazon.in/dp/X' → 'amazon.in'"""
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+class LatencyHistogram:
+    """Fixed log-spaced latency histogram with percentile estimates."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+            self.total += 1
+            # Halve old counts now and then so the histogram follows the site
+            if self.total >= 2000:
+                self.counts = [c // 2 for c in self.counts]
+                self.total = sum(self.counts)
+
+    def percentile(self, q: float):
+        """Upper bound of the bucket holding the q-th percentile, or None if empty."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKET_BOUNDS[min(i, len(BUCKET_BOUNDS) - 1)]
+        return BUCKET_BOUNDS[-1]
+
+
+class HedgeBudget:
+    """Allows hedged requests only while they stay under MAX_HEDGE_RATIO of all requests."""
+
+    def __init__(self, max_ratio: float):
+        self.max_ratio = max_ratio
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def note_request(self):
+        with self._lock:
+            self.requests += 1
+            if self.requests >= 10000:
+                self.requests //= 2
+                self.hedges //= 2
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+
+class LatencyTracker:
+    """Per-domain histograms plus the deadlines and hedge delay they drive."""
+
+    def __init__(self):
+        self.budget = HedgeBudget(MAX_HEDGE_RATIO)
+        self._histograms = {}
+
+    def histogram(self, domain: str) -> LatencyHistogram:
+        hist = self._histograms.get(domain)
+        if hist is None:
+            hist = self._histograms.setdefault(domain, LatencyHistogram())
+        return hist
+
+    def observe(self, domain: str, seconds: float):
+        self.histogram(domain).observe(seconds)
+
+    def deadlines(self, domain: str) -> dict:
+        """
+        Returns {'connect', 'first_byte', 'total'} for one attempt. Once the
+        domain has enough samples the total deadline tightens to 3x its p99.
+        """
+        d = {**DEADLINES['default'], **DEADLINES.get(domain, {})}
+        hist = self.histogram(domain)
+        if hist.total >= HEDGE_MIN_SAMPLES:
+            d['total'] = min(d['total'], max(hist.percentile(0.99) * 3, d['connect'] + d['first_byte']))
+        return d
+
+    def hedge_delay(self, domain: str):
+        """Seconds after which an attempt should be hedged, or None to not hedge."""
+        if not HEDGING_ENABLED:
+            return None
+        hist = self.histogram(domain)
+        if hist.total < HEDGE_MIN_SAMPLES:
+            return None
+        return hist.percentile(HEDGE_PERCENTILE)
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.budget.requests,
+            'hedges': self.budget.hedges,
+            'domains': {
+                domain: {
+                    'samples': hist.total,
+                    'p50': hist.percentile(0.50),
+                    'p95': hist.percentile(0.95),
+                    'p99': hist.percentile(0.99),
+                    'deadlines': self.deadlines(domain),
+                    'hedge_after': self.hedge_delay(domain),
+                }
+                for domain, hist in self._histograms.items()
+            },
+        }
+
+
+# Shared by every ProductScraper in the process
+latency = LatencyTracker()
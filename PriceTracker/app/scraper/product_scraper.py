@@ -1,10 +1,16 @@
 import requests
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import logging
 import time
+from app.scraper.latency import latency, domain_of
+from app.scraper.egress import get_egress_pool
 
 logger = logging.getLogger(__name__)
 
+# Runs the primary and hedged copies of a request
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='scrape-hedge')
+
 class ProductScraper:
     """
     A reusable class for scraping e-commerce product pages robustly.
@@ -18,19 +24,83 @@ class ProductScraper:
             "Accept-Language": "en-US,en;q=0.9",
         }
 
+    def _timed_get(self, avoid=None):
+        """
+        One GET bounded by the domain's connect / first-byte / total deadlines,
+        sent through the healthiest egress for the domain.
+        Returns (status_code, content, egress).
+        """
+        domain = domain_of(self.url)
+        pool = get_egress_pool()
+        egress = pool.choose(domain, exclude=avoid)
+        d = latency.deadlines(domain)
+        started = time.monotonic()
+        try:
+            with egress.session.get(self.url, headers=self.headers, stream=True,
+                                    timeout=(d['connect'], d['first_byte'])) as response:
+                chunks = []
+                for chunk in response.iter_content(chunk_size=65536):
+                    chunks.append(chunk)
+                    if time.monotonic() - started > d['total']:
+                        raise requests.exceptions.Timeout(f"total deadline of {d['total']}s exceeded")
+                status, content = response.status_code, b''.join(chunks)
+        except requests.exceptions.Timeout:
+            # Count timeouts at the deadline so slow sites push their own p95 up
+            latency.observe(domain, d['total'])
+            pool.record(egress, domain, False, d['total'])
+            raise
+        except requests.exceptions.RequestException:
+            pool.record(egress, domain, False, time.monotonic() - started)
+            raise
+        elapsed = time.monotonic() - started
+        latency.observe(domain, elapsed)
+        # 403/429/503 are how retailers throttle an IP, so they count against the egress
+        pool.record(egress, domain, status < 400 or status == 404, elapsed, len(content))
+        return status, content, egress
+
+    def _hedged_get(self, avoid=None):
+        """
+        Runs _timed_get and, if it is still running after the domain's p95
+        latency, starts a second copy (within the hedge budget). The first
+        to finish wins; the loser stops at its own total deadline.
+        """
+        latency.budget.note_request()
+        delay = latency.hedge_delay(domain_of(self.url))
+        if delay is None:
+            return self._timed_get(avoid)
+
+        primary = _hedge_executor.submit(self._timed_get, avoid)
+        done, _ = wait([primary], timeout=delay)
+        if done or not latency.budget.try_acquire():
+            return primary.result()
+
+        logger.info(f"Hedging slow request to {self.url} after {delay:.2f}s")
+        pending = {primary, _hedge_executor.submit(self._timed_get, avoid)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
     def fetch_html(self, retries=3, delay=2):
-        """Fetches HTML content with retries and timeout handling."""
+        """Fetches HTML content with retries, per-phase deadlines and hedging."""
+        avoid = None
         for attempt in range(retries):
             try:
-                response = requests.get(self.url, headers=self.headers, timeout=10)
-                if response.status_code == 200:
-                    self.soup = BeautifulSoup(response.content, 'html.parser')
+                status, content, egress = self._hedged_get(avoid)
+                if status == 200:
+                    self.soup = BeautifulSoup(content, 'html.parser')
                     return True
-                elif response.status_code == 404:
+                elif status == 404:
                     logger.error(f"Product not found (404): {self.url}")
                     return False
                 else:
-                    logger.warning(f"Attempt {attempt+1}: Status Code {response.status_code} for {self.url}")
+                    logger.warning(f"Attempt {attempt+1}: Status Code {status} for {self.url}")
+                    # Retry through a different egress than the one that was refused
+                    avoid = egress
             except requests.exceptions.RequestException as e:
                 logger.error(f"Attempt {attempt+1} - Request exception for {self.url}: {e}")
             
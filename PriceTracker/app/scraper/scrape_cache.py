@@ -0,0 +1,110 @@
+"""
+Scrape de-duplication.
+Concurrent requests for the same canonical URL share one in-flight scrape
+(singleflight), and successful results are kept for a short TTL so /add,
+force_check and the scheduler can reuse a scrape that just happened.
+"""
+import threading
+import time
+import logging
+from collections import OrderedDict
+from config import Config
+from app.utils.url_cleaner import clean_url
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs fn once per key at a time; callers that arrive meanwhile wait for that result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_flight = SingleFlight()
+_cache = TTLCache(Config.SCRAPE_CACHE_TTL)
+
+
+def fetch_product_details(url: str) -> dict | None:
+    """
+    Cached, de-duplicated ProductScraper.get_product_details().
+    Only results with a price are cached; failures are retried next time.
+    """
+    from app.scraper.product_scraper import ProductScraper
+    key = clean_url(url)
+
+    cached = _cache.get(key)
+    if cached is not None:
+        logger.info(f"Scrape cache hit: {key}")
+        return dict(cached)
+
+    def scrape():
+        details = ProductScraper(url).get_product_details()
+        if details and details.get('price') is not None:
+            _cache.set(key, details)
+        return details
+
+    details = _flight.do(key, scrape)
+    return dict(details) if details else None
@@ -0,0 +1,63 @@
+"""
+Data Versions.
+A change counter per product and per user, stored in the data_versions
+table so all worker processes share it and it survives restarts. Check
+runs bump a product when they store a price; notification fan-outs and the
+user's own edits (tracking list, targets, read state, profile) bump the
+user. HTTP validators (ETag / Last-Modified) are derived from these, so a
+conditional request is answered 304 without reading price history.
+
+Bumps run after the caller's own commit and commit at once. The version
+tag hashes every counter in scope (plus the global 'all' row), so it
+changes whenever any of them does; Last-Modified is the newest
+changed_at among them.
+"""
+import hashlib
+from datetime import datetime
+from sqlalchemy import select, func, or_, and_, text
+from app.models.models import db, DataVersion
+
+_UPSERT = text(
+    "INSERT INTO data_versions (scope, ref_id, version, changed_at) VALUES (:scope, :ref_id, 1, :now) "
+    "ON CONFLICT (scope, ref_id) DO UPDATE SET version = data_versions.version + 1, changed_at = excluded.changed_at")
+
+
+class DataVersions:
+    """Reads and bumps the (version, changed_at) rows of data_versions."""
+
+    def _bump(self, scope: str, ref_ids):
+        now = datetime.utcnow()
+        params = [{'scope': scope, 'ref_id': ref_id, 'now': now} for ref_id in set(ref_ids)]
+        if params:
+            db.session.execute(_UPSERT, params)
+            db.session.commit()
+
+    def bump_products(self, product_ids):
+        self._bump('product', product_ids)
+
+    def bump_users(self, user_ids):
+        self._bump('user', user_ids)
+
+    def bump_all(self):
+        """Invalidates every validator handed out so far (bulk changes such as retention)."""
+        self._bump('all', [0])
+
+    def stamp(self, user_id=None, product_ids=()) -> tuple:
+        """(version tag, last modified or None) covering a user and/or a set of products."""
+        v = DataVersion
+        scopes = [v.scope == 'all']
+        if user_id is not None:
+            scopes.append(and_(v.scope == 'user', v.ref_id == user_id))
+        if product_ids:
+            scopes.append(and_(v.scope == 'product', v.ref_id.in_(list(product_ids))))
+        rows = db.session.execute(select(v.scope, v.ref_id, v.version, v.changed_at)
+                                  .where(or_(*scopes)).order_by(v.scope, v.ref_id)).all()
+        tag = hashlib.sha1('|'.join(f'{r.scope}:{r.ref_id}:{r.version}' for r in rows).encode()).hexdigest()[:16]
+        changed = max((r.changed_at for r in rows), default=None)
+        return tag, changed.replace(microsecond=0) if changed else None
+
+    def stats(self) -> dict:
+        return dict(db.session.execute(select(DataVersion.scope, func.count()).group_by(DataVersion.scope)).all())
+
+
+data_versions = DataVersions()
@@ -0,0 +1,81 @@
+"""
+Chart Downsampling.
+Reduces a price series to a fixed point budget before it is embedded in a
+page, so chart payloads stay the same size however long a product has been
+tracked. Two strategies:
+  - lttb:   Largest-Triangle-Three-Buckets; keeps the points that carry the
+            visual shape of the line (detail charts).
+  - minmax: keeps the lowest and highest point of every bucket, so no low or
+            spike disappears (sparklines, where the lows are the story).
+The first and last points are always kept. Both run in O(n).
+"""
+LTTB = 'lttb'
+MINMAX = 'minmax'
+
+
+def lttb(xs, ys, budget: int) -> list:
+    """Indices of the `budget` points LTTB keeps from (xs, ys)."""
+    n = len(ys)
+    if budget >= n:
+        return list(range(n))
+    if budget < 3:
+        return [0, n - 1][:max(budget, 1)]
+
+    every = (n - 2) / (budget - 2)
+    picked = [0]
+    a = 0
+    for i in range(budget - 2):
+        # average of the next bucket is the third triangle corner
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        span = end - start
+        avg_x = sum(xs[start:end]) / span
+        avg_y = sum(ys[start:end]) / span
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = -1, -1.0
+        for j in range(int(i * every) + 1, start):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    picked.append(n - 1)
+    return picked
+
+
+def minmax(ys, budget: int) -> list:
+    """Indices of each bucket's min and max (in time order), plus both ends."""
+    n = len(ys)
+    if budget >= n:
+        return list(range(n))
+    buckets = (budget - 2) // 2
+    if buckets < 1:
+        return [0, n - 1][:max(budget, 1)]
+    every = (n - 2) / buckets
+    picked = [0]
+    for i in range(buckets):
+        lo = int(i * every) + 1
+        hi = n - 1 if i == buckets - 1 else int((i + 1) * every) + 1
+        if lo >= hi:
+            continue
+        seg = range(lo, hi)
+        picked.extend(sorted({min(seg, key=ys.__getitem__), max(seg, key=ys.__getitem__)}))
+    picked.append(n - 1)
+    return picked
+
+
+def downsample(rows: list, budget: int, y, x=None, method: str = LTTB) -> list:
+    """
+    Subset of `rows` (kept in order) for a chart of at most ~`budget` points.
+    `y(row)` gives the value; `x(row)` a number such as a timestamp (row
+    position if omitted, i.e. evenly spaced checks).
+    """
+    if not budget or len(rows) <= budget:
+        return rows
+    ys = [y(r) for r in rows]
+    if method == MINMAX:
+        keep = minmax(ys, budget)
+    else:
+        keep = lttb([x(r) for r in rows] if x else range(len(rows)), ys, budget)
+    return [rows[i] for i in keep]
@@ -0,0 +1,138 @@
+"""
+Live Events (Server-Sent Events).
+A small in-process pub/sub. Check runs publish new notifications to
+"user:<id>" and price changes to "product:<id>"; each open /api/events
+stream subscribes to its user topic and the products that user tracks.
+Every subscriber gets a bounded buffer (oldest events are dropped when a
+client falls behind), so an idle connection is just an empty deque.
+
+Each open stream holds a server thread while it waits, so a threaded or
+sync WSGI server is tied up by a few idle tabs. Run the app under a
+gevent (or other async) worker when live updates are on. Even then the
+bus admits at most SSE_MAX_SUBSCRIBERS streams per process; beyond that
+/api/events answers 503 with Retry-After and the page falls back to
+polling. Streams end after SSE_MAX_LIFETIME seconds and the browser
+reconnects, so the limit frees up over time.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+HEARTBEAT_SECONDS = 20
+BUFFER_SIZE = 50
+
+
+def user_topic(user_id: int) -> str:
+    return f'user:{user_id}'
+
+
+def product_topic(product_id: int) -> str:
+    return f'product:{product_id}'
+
+
+class Subscription:
+    """One client's bounded event buffer."""
+
+    def __init__(self, topics, maxsize: int = BUFFER_SIZE):
+        self.topics = frozenset(topics)
+        self._events = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, event: tuple):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: float):
+        """Next (event_type, data), or None after `timeout` seconds without one."""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+
+class EventBus:
+    """topic -> set of Subscriptions."""
+
+    def __init__(self, max_subscribers: int = 0):
+        self.max_subscribers = max_subscribers      # 0 = unlimited
+        self._topics = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.rejected = 0
+
+    def subscribe(self, topics):
+        """A new Subscription, or None if max_subscribers streams are already open."""
+        sub = Subscription(topics)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._subscribers.add(sub)
+            for topic in sub.topics:
+                self._topics.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+            for topic in sub.topics:
+                subs = self._topics.get(topic)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._topics[topic]
+
+    def publish(self, topic: str, event_type: str, data: dict) -> int:
+        """Delivers to every subscriber of `topic`; returns how many got it. Never blocks."""
+        with self._lock:
+            subs = list(self._topics.get(topic, ()))
+        for sub in subs:
+            sub.put((event_type, data))
+        self.published += 1
+        return len(subs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subs = set(self._subscribers)
+        return {
+            'subscribers': len(subs),
+            'max_subscribers': self.max_subscribers,
+            'rejected': self.rejected,
+            'topics': len(self._topics),
+            'published': self.published,
+            'dropped': sum(s.dropped for s in subs),
+        }
+
+
+def sse_stream(bus: EventBus, sub: Subscription, max_lifetime: float = 0):
+    """
+    Generator of SSE frames for one subscription; unsubscribes when the
+    client goes away or, after `max_lifetime` seconds, ends the stream so
+    the browser reconnects.
+    """
+    deadline = time.monotonic() + max_lifetime if max_lifetime else None
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            timeout = HEARTBEAT_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return
+            event = sub.get(timeout)
+            if event is None:
+                yield ': ping\n\n'     # keeps proxies from closing an idle stream
+                continue
+            event_type, data = event
+            yield f'event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n'
+    finally:
+        bus.unsubscribe(sub)
+
+
+event_bus = EventBus()
@@ -0,0 +1,73 @@
+"""
+Data Export.
+Streams a user's tracked products (one row each, with their lowest price)
+or their full price history as CSV or NDJSON. History rows are read from
+the history store through a server-side cursor in chunks of EXPORT_CHUNK
+and written out as they arrive, so memory use does not grow with the size
+of the export.
+"""
+import csv
+import io
+import json
+from app.models.models import db, Product, user_products
+from app.services.history_store import history_store
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+SUMMARY_COLUMNS = ('product', 'url', 'current_price', 'lowest_ever', 'added_at')
+HISTORY_COLUMNS = ('product_id', 'product', 'url', 'price', 'checked_at')
+CSV_HEADERS = {
+    SUMMARY_COLUMNS: ['Product', 'URL', 'Current Price', 'Lowest Ever', 'Added At'],
+    HISTORY_COLUMNS: ['Product ID', 'Product', 'URL', 'Price', 'Checked At'],
+}
+
+
+def _tracked(user_id: int) -> list:
+    return db.session.execute(
+        db.select(Product.id, Product.product_name, Product.url, Product.last_price, Product.created_at)
+        .join(user_products, user_products.c.product_id == Product.id)
+        .where(user_products.c.user_id == user_id)
+        .order_by(Product.id)
+    ).all()
+
+
+def summary_rows(user_id: int):
+    """(name, url, last_price, lowest, created_at) per tracked product; lowest from one stats query."""
+    products = _tracked(user_id)
+    stats = history_store.stats([p.id for p in products]) if products else {}
+    for p in products:
+        lowest = stats[p.id][0] if p.id in stats else p.last_price
+        yield p.product_name, p.url, p.last_price, lowest, p.created_at.strftime('%Y-%m-%d')
+
+
+def history_rows(user_id: int, chunk: int, since=None, until=None):
+    """Every price check of the user's tracked products, by product then time."""
+    for p in _tracked(user_id):
+        for row in history_store.stream([p.id], since, until, chunk):
+            yield p.id, p.product_name, p.url, row.price, row.checked_at.isoformat()
+
+
+def stream(fmt: str, columns: tuple, rows, chunk: int):
+    """Encodes `rows` as CSV (with a header) or NDJSON, yielding one string per `chunk` rows."""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_HEADERS[columns])
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+            buffer.write('\n')
+
+    pending = 0
+    for row in rows:
+        write(row)
+        pending += 1
+        if pending == chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    tail = buffer.getvalue()
+    if tail:
+        yield tail
@@ -0,0 +1,204 @@
+"""
+Columnar Price History Archive.
+Copies price_history into one Arrow IPC file per calendar month
+(HISTORY_ARCHIVE_DIR/price_history/month=YYYY-MM/part.arrow, a
+hive-style layout pyarrow.dataset can also open), sorted by product and
+time, with the month's row count beside it in _rows (pyarrow.dataset
+skips files starting with '_'). Analytics read these through
+memory-mapped files instead of scanning the OLTP database; `scan()` can
+top up the months not archived yet from the database so callers always
+see the whole history.
+
+Only complete months are written, once each; rows stay in price_history.
+Files are uncompressed by default so columns are read zero-copy from the
+mapping; HISTORY_ARCHIVE_COMPRESSION=zstd or lz4 trades that for roughly
+3-5x less disk.
+pyarrow is optional: without it the job logs a warning and does nothing.
+"""
+import logging
+import os
+from datetime import datetime
+from itertools import islice
+from app.services.history_store import history_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:   # analytics archive disabled
+    pa = pc = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_ROWS = 65536
+
+
+def _schema():
+    return pa.schema([('product_id', pa.int64()), ('price', pa.float64()), ('checked_at', pa.timestamp('us'))])
+
+
+def _month_start(month: str) -> datetime:
+    return datetime.strptime(month, '%Y-%m')
+
+
+def _next_month(start: datetime) -> datetime:
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def _record_batch(rows, schema):
+    return pa.record_batch([pa.array([r.product_id for r in rows], pa.int64()),
+                            pa.array([r.price for r in rows], pa.float64()),
+                            pa.array([r.checked_at for r in rows], pa.timestamp('us'))], schema=schema)
+
+
+def month_path(directory: str, month: str) -> str:
+    return os.path.join(directory, 'price_history', f'month={month}', 'part.arrow')
+
+
+def _rows_path(directory: str, month: str) -> str:
+    return os.path.join(os.path.dirname(month_path(directory, month)), '_rows')
+
+
+def _batches(rows, schema):
+    """Record batches of up to BATCH_ROWS from an iterator of history rows."""
+    while True:
+        chunk = list(islice(rows, BATCH_ROWS))
+        if not chunk:
+            return
+        yield _record_batch(chunk, schema)
+
+
+# ── Writing ───────────────────────────────────────────────────────────────
+def write_month(directory: str, month: str, compression: str = 'none') -> int:
+    """Writes one month of price_history to its Arrow file and row count (atomically). Returns rows written."""
+    start = _month_start(month)
+    rows_in_month = history_store.stream(since=start, until=_next_month(start), chunk=BATCH_ROWS)
+
+    path = month_path(directory, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    schema = _schema()
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == 'none' else compression)
+    rows = 0
+    with pa.OSFile(path + '.tmp', 'wb') as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for batch in _batches(rows_in_month, schema):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    os.replace(path + '.tmp', path)
+    rows_path = _rows_path(directory, month)
+    with open(rows_path + '.tmp', 'w') as f:
+        f.write(str(rows))
+    os.replace(rows_path + '.tmp', rows_path)
+    return rows
+
+
+def archive_history(directory: str, compression: str = 'none', force: bool = False) -> dict:
+    """Archives every complete month not archived yet (all of them with `force`). Returns {month: rows}."""
+    first = history_store.first_checked_at()
+    if first is None:
+        return {}
+    current = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    written = {}
+    month = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month < current:
+        name = month.strftime('%Y-%m')
+        if force or not os.path.exists(month_path(directory, name)):
+            written[name] = write_month(directory, name, compression)
+        month = _next_month(month)
+    return written
+
+
+def run_history_archive(app):
+    """Scheduler job: archive finished months of price history."""
+    with app.app_context():
+        if pa is None:
+            logger.warning("History archive skipped: pyarrow is not installed.")
+            return
+        written = archive_history(app.config['HISTORY_ARCHIVE_DIR'], app.config.get('HISTORY_ARCHIVE_COMPRESSION', 'none'))
+        if written:
+            logger.info(f"🗄️ History archive: wrote {', '.join(f'{m} ({n:,} rows)' for m, n in written.items())}")
+
+
+# ── Reading ───────────────────────────────────────────────────────────────
+def months(directory: str) -> list:
+    """Archived months ('YYYY-MM'), oldest first."""
+    root = os.path.join(directory, 'price_history')
+    if not os.path.isdir(root):
+        return []
+    return sorted(d[len('month='):] for d in os.listdir(root)
+                  if d.startswith('month=') and os.path.exists(os.path.join(root, d, 'part.arrow')))
+
+
+def read_month(directory: str, month: str, columns=None):
+    """One archived month as a pyarrow Table backed by a memory-mapped file."""
+    reader = pa.ipc.open_file(pa.memory_map(month_path(directory, month), 'r'))
+    table = reader.read_all()
+    return table.select(list(columns)) if columns else table
+
+
+def _live_rows(after: datetime, product_ids, until):
+    schema = _schema()
+    rows = history_store.stream(list(product_ids) if product_ids is not None else None, after, until, chunk=BATCH_ROWS)
+    return pa.Table.from_batches(list(_batches(rows, schema)), schema=schema)
+
+
+def scan(directory: str, product_ids=None, since: datetime = None, until: datetime = None,
+         columns=None, include_live: bool = True):
+    """
+    Price history as one pyarrow Table (product_id, price, checked_at),
+    filtered by product and [since, until). Archived months are read
+    memory-mapped and skipped entirely when outside the range; with
+    `include_live` the months after the newest archive come from the
+    database (needs an app context).
+    """
+    if pa is None:
+        raise RuntimeError('pyarrow is required to read the history archive')
+    tables = []
+    archived = months(directory)
+    for month in archived:
+        start = _month_start(month)
+        if (since and _next_month(start) <= since) or (until and start >= until):
+            continue
+        table = read_month(directory, month)
+        mask = None
+        if product_ids is not None:
+            mask = pc.is_in(table['product_id'], value_set=pa.array(list(product_ids), pa.int64()))
+        if since and start < since:
+            mask = _and(mask, pc.greater_equal(table['checked_at'], pa.scalar(since, pa.timestamp('us'))))
+        if until and _next_month(start) > until:
+            mask = _and(mask, pc.less(table['checked_at'], pa.scalar(until, pa.timestamp('us'))))
+        tables.append(table.filter(mask) if mask is not None else table)
+
+    if include_live:
+        after = _next_month(_month_start(archived[-1])) if archived else None
+        if since and (after is None or since > after):
+            after = since
+        if not (until and after and after >= until):
+            tables.append(_live_rows(after, product_ids, until))
+
+    table = pa.concat_tables(tables) if tables else _schema().empty_table()
+    return table.select(list(columns)) if columns else table
+
+
+def _and(mask, condition):
+    return condition if mask is None else pc.and_(mask, condition)
+
+
+def stats(directory: str) -> dict:
+    """Archived months with their row counts and file sizes."""
+    result = {'available': pa is not None, 'months': {}}
+    if pa is None:
+        return result
+    for month in months(directory):
+        path = month_path(directory, month)
+        result['months'][month] = {'rows': _month_rows(directory, month), 'bytes': os.path.getsize(path)}
+    return result
+
+
+def _month_rows(directory: str, month: str) -> int:
+    """Row count from _rows; files archived before it existed are counted batch by batch."""
+    try:
+        with open(_rows_path(directory, month)) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        with pa.memory_map(month_path(directory, month), 'r') as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
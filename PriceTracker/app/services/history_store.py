@@ -0,0 +1,374 @@
+"""
+Price History Store.
+All price history reads and writes go through `history_store`. By default
+it is a thin layer over the price_history table. With HISTORY_PARTITIONED
+set, new rows go to one SQLite file per month (HISTORY_PARTITION_DIR/
+price_history_YYYY_MM.db) and range queries are routed only to the month
+files they overlap; dropping a month is deleting its file.
+
+Rows already in price_history stay readable as the oldest "partition"
+until migrate_legacy() (run by the retention job) has moved them out.
+Month files get their own connections rather than being ATTACHed, since
+SQLite allows only 10 attached databases by default.
+Row ids start at YYYYMM * 10^10 in each month file, so they stay unique.
+A month-file row is written only after the caller's session commits, so a
+rolled-back check never leaves history behind. The insert ignores
+duplicates on (product_id, checked_at), so replaying it is harmless. A
+failed write is kept and retried after the next commit.
+
+Recorded checks are copied into the series store and the predictor's
+trend windows only once the session that recorded them commits (and
+dropped if it rolls back), so those never hold a price that is not in
+the history.
+"""
+import logging
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import (MetaData, Table, Column, Integer, Float, DateTime, Index,
+                        create_engine, select, insert, delete, func, and_, text, event)
+from sqlalchemy.orm import Session
+from app.models.models import db, Product, PriceHistory
+from app.utils.pagination import after
+
+logger = logging.getLogger(__name__)
+
+ID_STRIDE = 10 ** 10
+PENDING = 'history_store.pending'     # session.info key: checks recorded but not committed yet
+
+DayCount = namedtuple('DayCount', 'day count')
+
+_partition_metadata = MetaData()
+PARTITION = Table(
+    'price_history', _partition_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('product_id', Integer, nullable=False),
+    Column('price', Float, nullable=False),
+    Column('checked_at', DateTime, nullable=False),
+    Index('ux_price_history_product_checked', 'product_id', 'checked_at', unique=True),
+    sqlite_autoincrement=True,
+)
+
+
+def _ensure_unique(engine):
+    """Month files made before the unique index get it, after dropping duplicate checks."""
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'index' "
+                                   "AND name = 'ux_price_history_product_checked'")).first()
+        if exists:
+            return
+        conn.execute(text("DELETE FROM price_history WHERE id NOT IN "
+                          "(SELECT MIN(id) FROM price_history GROUP BY product_id, checked_at)"))
+        conn.execute(text("CREATE UNIQUE INDEX ux_price_history_product_checked "
+                          "ON price_history (product_id, checked_at)"))
+
+
+def _month_start(month: str) -> datetime:
+    return datetime.strptime(month, '%Y-%m')
+
+
+def _next_month(start: datetime) -> datetime:
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+class _Source:
+    """One place history lives: the main price_history table or a month file."""
+
+    def __init__(self, table, engine=None):
+        self.table = table
+        self.engine = engine
+
+    def rows(self, stmt) -> list:
+        if self.engine is None:
+            return db.session.execute(stmt).all()
+        with self.engine.connect() as conn:
+            return conn.execute(stmt).all()
+
+    def stream(self, stmt, chunk: int):
+        stmt = stmt.execution_options(yield_per=chunk)
+        if self.engine is None:
+            yield from db.session.execute(stmt)
+            return
+        with self.engine.connect() as conn:
+            yield from conn.execute(stmt)
+
+
+class HistoryStore:
+
+    def __init__(self):
+        self.directory = None
+        self._engines = {}
+        self._legacy = None
+        self._unwritten = []     # committed checks whose month-file write failed
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if app.config.get('HISTORY_PARTITIONED'):
+            self.directory = app.config['HISTORY_PARTITION_DIR']
+            os.makedirs(self.directory, exist_ok=True)
+        else:
+            self.directory = None
+
+    @property
+    def partitioned(self) -> bool:
+        return self.directory is not None
+
+    # ── Partitions ────────────────────────────────────────────────────────
+    def _path(self, month: str) -> str:
+        return os.path.join(self.directory, f"price_history_{month.replace('-', '_')}.db")
+
+    def months(self) -> list:
+        """Month partitions on disk ('YYYY-MM'), oldest first."""
+        if not self.partitioned:
+            return []
+        return sorted(f[len('price_history_'):-3].replace('_', '-') for f in os.listdir(self.directory)
+                      if f.startswith('price_history_') and f.endswith('.db'))
+
+    def _engine(self, month: str):
+        with self._lock:
+            engine = self._engines.get(month)
+            if engine is None:
+                path = self._path(month)
+                is_new = not os.path.exists(path)
+                engine = create_engine(f'sqlite:///{path}')
+                if is_new:
+                    _partition_metadata.create_all(engine)
+                    start = _month_start(month)
+                    with engine.begin() as conn:
+                        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('price_history', :seq)"),
+                                     {'seq': (start.year * 100 + start.month) * ID_STRIDE})
+                else:
+                    _ensure_unique(engine)
+                self._engines[month] = engine
+            return engine
+
+    def _has_legacy(self) -> bool:
+        if self._legacy is None:
+            self._legacy = db.session.execute(select(PriceHistory.id).limit(1)).first() is not None
+        return self._legacy
+
+    def _sources(self, since=None, until=None, descending=False) -> list:
+        """Sources that can hold rows in [since, until), oldest first (newest with `descending`)."""
+        if not self.partitioned:
+            return [_Source(PriceHistory.__table__)]
+        sources = [_Source(PriceHistory.__table__)] if self._has_legacy() else []
+        for month in self.months():
+            start = _month_start(month)
+            if (since and _next_month(start) <= since) or (until and start >= until):
+                continue
+            sources.append(_Source(PARTITION, self._engine(month)))
+        return sources[::-1] if descending else sources
+
+    def drop_month(self, month: str):
+        """Deletes a whole month of history — one file removal."""
+        with self._lock:
+            engine = self._engines.pop(month, None)
+            if engine is not None:
+                engine.dispose()
+            for suffix in ('', '-journal', '-wal', '-shm'):
+                if os.path.exists(self._path(month) + suffix):
+                    os.remove(self._path(month) + suffix)
+
+    def drop_before(self, keep_months: int) -> list:
+        """Drops month partitions older than the last `keep_months` months; returns them."""
+        oldest = datetime.utcnow().replace(day=1)
+        for _ in range(keep_months - 1):
+            oldest = (oldest - timedelta(days=1)).replace(day=1)
+        dropped = [m for m in self.months() if m < oldest.strftime('%Y-%m')]
+        for month in dropped:
+            self.drop_month(month)
+        return dropped
+
+    def migrate_legacy(self, batch_size: int) -> int:
+        """Moves rows from the main price_history table into month files, one batch per call."""
+        if not self.partitioned or not self._has_legacy():
+            return 0
+        rows = db.session.execute(
+            select(PriceHistory.id, PriceHistory.product_id, PriceHistory.price, PriceHistory.checked_at)
+            .order_by(PriceHistory.id).limit(batch_size)).all()
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row.checked_at.strftime('%Y-%m'), []).append(
+                {'product_id': row.product_id, 'price': row.price, 'checked_at': row.checked_at})
+        for month, values in by_month.items():
+            with self._engine(month).begin() as conn:
+                conn.execute(insert(PARTITION).prefix_with('OR IGNORE'), values)
+        if rows:
+            db.session.execute(delete(PriceHistory).where(PriceHistory.id <= rows[-1].id))
+            db.session.commit()
+        self._legacy = len(rows) == batch_size
+        return len(rows)
+
+    def purge_orphans(self) -> int:
+        """Deletes month-file rows of products that no longer exist. Returns rows deleted."""
+        if not self.partitioned:
+            return 0
+        live = set(db.session.execute(select(Product.id)).scalars())
+        removed = 0
+        for month in self.months():
+            with self._engine(month).begin() as conn:
+                gone = [pid for pid in conn.execute(select(PARTITION.c.product_id).distinct()).scalars()
+                        if pid not in live]
+                if gone:
+                    removed += conn.execute(delete(PARTITION).where(PARTITION.c.product_id.in_(gone))).rowcount
+        return removed
+
+    # ── Writes ────────────────────────────────────────────────────────────
+    def record(self, product_id: int, price: float, checked_at: datetime = None):
+        """
+        Stores one price check as part of the current session's unit of work.
+        Unpartitioned it is added to the session; a month-file row and the
+        series store and trend windows are written once the session commits.
+        """
+        checked_at = checked_at or datetime.utcnow()
+        db.session.info.setdefault(PENDING, []).append((product_id, price, checked_at))
+        if not self.partitioned:
+            db.session.add(PriceHistory(product_id=product_id, price=price, checked_at=checked_at))
+
+    def _write_partitions(self, checks):
+        """Inserts committed checks (plus earlier failed ones) into their month files."""
+        with self._lock:
+            checks, self._unwritten = self._unwritten + list(checks), []
+        by_month = {}
+        for check in checks:
+            by_month.setdefault(check[2].strftime('%Y-%m'), []).append(check)
+        for month, batch in by_month.items():
+            try:
+                with self._engine(month).begin() as conn:
+                    conn.execute(insert(PARTITION).prefix_with('OR IGNORE'),
+                                 [{'product_id': pid, 'price': price, 'checked_at': at} for pid, price, at in batch])
+            except Exception as e:
+                logger.error(f"❌ Price history write to {month} failed, retrying after the next commit: {e}")
+                with self._lock:
+                    self._unwritten.extend(batch)
+
+    # ── Reads ─────────────────────────────────────────────────────────────
+    @staticmethod
+    def _select(t, product_ids=None, since=None, until=None):
+        stmt = select(t.c.id, t.c.product_id, t.c.price, t.c.checked_at)
+        if product_ids is not None:
+            stmt = stmt.where(t.c.product_id.in_(product_ids))
+        if since:
+            stmt = stmt.where(t.c.checked_at >= since)
+        if until:
+            stmt = stmt.where(t.c.checked_at < until)
+        return stmt
+
+    def series(self, product_id: int, since: datetime = None, until: datetime = None) -> list:
+        """Rows (id, product_id, price, checked_at) of one product, oldest first."""
+        rows = []
+        for source in self._sources(since, until):
+            t = source.table
+            rows.extend(source.rows(self._select(t, [product_id], since, until).order_by(t.c.checked_at, t.c.id)))
+        return rows
+
+    def series_many(self, product_ids, since: datetime = None, until: datetime = None) -> dict:
+        """{product_id: rows oldest first} with one query per partition."""
+        result = {pid: [] for pid in product_ids}
+        if not result:
+            return result
+        for source in self._sources(since, until):
+            t = source.table
+            for row in source.rows(self._select(t, list(result), since, until)
+                                   .order_by(t.c.product_id, t.c.checked_at, t.c.id)):
+                result[row.product_id].append(row)
+        return result
+
+    def page(self, product_id: int, limit: int, since=None, until=None,
+             descending: bool = False, cursor: tuple = None) -> list:
+        """Up to `limit` rows of one product after keyset `cursor` (checked_at, id)."""
+        rows = []
+        for source in self._sources(since, until, descending):
+            t = source.table
+            key = (t.c.checked_at, t.c.id)
+            stmt = (self._select(t, [product_id], since, until)
+                    .order_by(*(k.desc() if descending else k.asc() for k in key))
+                    .limit(limit - len(rows)))
+            if cursor:
+                stmt = stmt.where(after(key, cursor, descending))
+            rows.extend(source.rows(stmt))
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def stream(self, product_ids=None, since=None, until=None, chunk: int = 1000):
+        """Yields rows in [since, until) partition by partition, each by product then time."""
+        for source in self._sources(since, until):
+            t = source.table
+            yield from source.stream(self._select(t, product_ids, since, until)
+                                     .order_by(t.c.product_id, t.c.checked_at), chunk)
+
+    def stats(self, product_ids) -> dict:
+        """{product_id: (lowest, highest, checks)}."""
+        merged = {}
+        for source in self._sources():
+            t = source.table
+            for pid, lo, hi, n in source.rows(select(t.c.product_id, func.min(t.c.price), func.max(t.c.price),
+                                                     func.count(t.c.id))
+                                              .where(t.c.product_id.in_(product_ids)).group_by(t.c.product_id)):
+                if pid in merged:
+                    mlo, mhi, mn = merged[pid]
+                    lo, hi, n = min(lo, mlo), max(hi, mhi), n + mn
+                merged[pid] = (lo, hi, n)
+        return merged
+
+    def prices_before(self, at: datetime, product_ids=None) -> dict:
+        """
+        {product_id: last recorded price before `at`}, walking partitions newest
+        first; stops early once every id in `product_ids` (if given) is found.
+        """
+        found = {}
+        for source in self._sources(until=at, descending=True):
+            if product_ids is not None and found.keys() >= set(product_ids):
+                break
+            t = source.table
+            latest = (select(t.c.product_id, func.max(t.c.checked_at).label('checked_at'))
+                      .where(t.c.checked_at < at).group_by(t.c.product_id).subquery())
+            for product_id, price in source.rows(
+                    select(t.c.product_id, t.c.price)
+                    .join(latest, and_(t.c.product_id == latest.c.product_id, t.c.checked_at == latest.c.checked_at))):
+                found.setdefault(product_id, price)
+        return found
+
+    def first_checked_at(self):
+        for source in self._sources():
+            first = source.rows(select(func.min(source.table.c.checked_at)))[0][0]
+            if first is not None:
+                return first
+        return None
+
+    def count(self) -> int:
+        return sum(source.rows(select(func.count()).select_from(source.table))[0][0] for source in self._sources())
+
+    def checks_per_day(self, days: int = 7) -> list:
+        """[DayCount(day 'YYYY-MM-DD', count)] for the last `days` days with checks, newest first."""
+        since = (datetime.utcnow() - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        counts = {}
+        for source in self._sources(since):
+            t = source.table
+            for day, n in source.rows(select(func.date(t.c.checked_at), func.count(t.c.id))
+                                      .where(t.c.checked_at >= since).group_by(func.date(t.c.checked_at))):
+                counts[day] = counts.get(day, 0) + n
+        return [DayCount(day, counts[day]) for day in sorted(counts, reverse=True)]
+
+
+history_store = HistoryStore()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed(session):
+    """Writes the checks a session recorded to month files, the series store and trend windows."""
+    from app.services.series_store import series_store
+    from app.services.price_predictor import trend_state
+    checks = session.info.pop(PENDING, ())
+    if history_store.partitioned and (checks or history_store._unwritten):
+        history_store._write_partitions(checks)
+    for product_id, price, checked_at in checks:
+        series_store.append(product_id, price, checked_at)
+        trend_state.update(product_id, price, checked_at)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop(PENDING, None)
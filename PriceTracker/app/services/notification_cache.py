@@ -0,0 +1,84 @@
+"""
+Notification Cache.
+Keeps each user's unread count and latest notifications in memory so the
+bell icon (rendered on every page) doesn't query the notifications table.
+Entries are dropped whenever notifications are written for a user's
+products or marked read, and expire after NOTIFICATION_CACHE_TTL seconds
+as a backstop (e.g. several worker processes).
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from app.models.models import db, Notification, user_products
+
+RECENT_LIMIT = 10
+
+# Detached, read-only copy of a Notification row for templates
+CachedNotification = namedtuple('CachedNotification', 'id message type severity is_read repeat_count created_at')
+
+
+class NotificationCache:
+    """LRU of user_id -> (stored_at, unread_count, recent notifications)."""
+
+    def __init__(self, ttl: float = 300, max_users: int = 10000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> tuple:
+        """(unread_count, recent_notifications) — from memory, or two queries on a miss."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1], entry[2]
+        self.misses += 1
+
+        unread = Notification.query.filter_by(user_id=user_id, is_read=False).count()
+        recent = tuple(
+            CachedNotification(n.id, n.message, n.type, n.severity, n.is_read, n.repeat_count or 1, n.created_at)
+            for n in Notification.query.filter_by(user_id=user_id)
+                                       .order_by(Notification.created_at.desc())
+                                       .limit(RECENT_LIMIT)
+        )
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), unread, recent)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return unread, recent
+
+    def mark_all_read(self, user_id: int):
+        """Updates a cached entry in place after the user marks everything read."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries[user_id] = (entry[0], 0, tuple(n._replace(is_read=True) for n in entry[2]))
+
+    def invalidate(self, user_ids=None):
+        """Drops the given users' entries, or everything if user_ids is None."""
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+                return
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def invalidate_product(self, product_id: int) -> list:
+        """Drops the entries of every user tracking product_id (after a fan-out); returns their ids."""
+        rows = db.session.execute(
+            db.select(user_products.c.user_id).where(user_products.c.product_id == product_id)
+        )
+        user_ids = [user_id for (user_id,) in rows]
+        self.invalidate(user_ids)
+        return user_ids
+
+    def stats(self) -> dict:
+        return {'users': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+notification_cache = NotificationCache()
@@ -1,58 +1,42 @@
 """
 Smart Price Prediction Engine (Phase 4).
 Uses recent price history to predict whether a price is likely to drop soon.
-Algorithm: Linear regression over last N price points.
+Algorithm: Linear regression over last N price points, computed on the
+product's series from the memory-mapped series store.
+
+predict_many() gives the same answers for a whole list of products in one
+vectorized pass: every window is concatenated into one array and the
+per-product sums, min/max and last price come from grouped reductions.
+
+For the default 14-day window, predict_price_trend() answers from
+`trend_state`: per product it keeps the window's checks with running sums
+(n, Σx, Σy, Σxy, Σx²) and monotonic deques for the min and max. Every
+check committed through the history store is pushed in, expired checks are
+evicted as the window slides, and a prediction is an O(1) read. A
+product's state is seeded from its series the first time it is asked for.
 """
 import logging
+import threading
+from collections import deque
 from datetime import datetime, timedelta
-from app.models.models import PriceHistory
+import numpy as np
+from app.services.series_store import series_store, epoch
 
 logger = logging.getLogger(__name__)
 
+WINDOW_DAYS = 14
+RESUM_EVERY = 1024      # window updates between exact re-summations
 
-def predict_price_trend(product_id: int, days: int = 14) -> dict:
-    """
-    Given a product_id, analyse recent price history and return a simple
-    buy/wait recommendation with reasoning.
+NOT_ENOUGH_HISTORY = {
+    "recommendation": "neutral",
+    "reason": "Not enough price history yet — check back in a few days.",
+    "predicted_drop_pct": None,
+    "confidence": "low"
+}
 
-    Returns a dict:
-        {
-          "recommendation": "buy" | "wait" | "neutral",
-          "reason": str,
-          "predicted_drop_pct": float | None,  # estimated drop if waiting
-          "confidence": "high" | "medium" | "low"
-        }
-    """
-    since = datetime.utcnow() - timedelta(days=days)
-    history = (
-        PriceHistory.query
-        .filter(PriceHistory.product_id == product_id,
-                PriceHistory.checked_at >= since)
-        .order_by(PriceHistory.checked_at.asc())
-        .all()
-    )
-
-    if len(history) < 3:
-        return {
-            "recommendation": "neutral",
-            "reason": "Not enough price history yet — check back in a few days.",
-            "predicted_drop_pct": None,
-            "confidence": "low"
-        }
 
-    prices = [h.price for h in history]
-    n = len(prices)
-
-    # Simple linear regression slope
-    x_mean = (n - 1) / 2
-    y_mean = sum(prices) / n
-    num = sum((i - x_mean) * (p - y_mean) for i, p in enumerate(prices))
-    den = sum((i - x_mean) ** 2 for i in range(n))
-    slope = num / den if den else 0
-
-    last_price = prices[-1]
-    lowest     = min(prices)
-    highest    = max(prices)
+def _recommend(slope: float, last_price: float, lowest: float, highest: float) -> dict:
+    """Buy/wait heuristics on a window's regression slope and price range."""
     volatility = (highest - lowest) / highest * 100 if highest else 0
 
     # Simple heuristic rules
@@ -85,3 +69,213 @@ def predict_price_trend(product_id: int, days: int = 14) -> dict:
             "predicted_drop_pct": None,
             "confidence": "low"
         }
+
+
+def predict_price_trend(product_id: int, days: int = WINDOW_DAYS) -> dict:
+    """
+    Given a product_id, analyse recent price history and return a simple
+    buy/wait recommendation with reasoning.
+
+    Returns a dict:
+        {
+          "recommendation": "buy" | "wait" | "neutral",
+          "reason": str,
+          "predicted_drop_pct": float | None,  # estimated drop if waiting
+          "confidence": "high" | "medium" | "low"
+        }
+    """
+    if days == trend_state.days:
+        return trend_state.predict(product_id)
+    return _predict_from_series(product_id, days)
+
+
+def _predict_from_series(product_id: int, days: int) -> dict:
+    """predict_price_trend() recomputed from the product's stored series."""
+    since = datetime.utcnow() - timedelta(days=days)
+    times, prices = series_store.series(product_id)
+    prices = prices[np.searchsorted(times, epoch(since)):].astype(np.float64)
+
+    if len(prices) < 3:
+        return dict(NOT_ENOUGH_HISTORY)
+
+    # Least-squares slope against the check index, centred so that Σx = 0
+    n = len(prices)
+    x = np.arange(n) - (n - 1) / 2
+    den = float(x @ x)
+    slope = float(x @ prices) / den if den else 0
+
+    return _recommend(slope, float(prices[-1]), float(prices.min()), float(prices.max()))
+
+
+def predict_many(product_ids, days: int = WINDOW_DAYS, series: dict = None) -> dict:
+    """
+    {product_id: prediction} for every id, equal to predict_price_trend()
+    per product. `series` may pass in series_store.series_many() output the
+    caller already has.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    since = epoch(datetime.utcnow() - timedelta(days=days))
+    series = series if series is not None else series_store.series_many(product_ids)
+    windows = [prices[np.searchsorted(times, since):] for times, prices in (series[pid] for pid in product_ids)]
+
+    counts = np.array([len(w) for w in windows], np.int64)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    y = np.concatenate(windows).astype(np.float64)
+    group = np.repeat(np.arange(len(product_ids)), counts)
+
+    # Centred check index within each window, then Σxy and Σx² per product
+    x = np.arange(len(y)) - starts[group] - (counts[group] - 1) / 2
+    sxy = np.bincount(group, weights=x * y, minlength=len(product_ids))
+    sxx = counts * (counts ** 2 - 1) / 12
+    slope = np.divide(sxy, sxx, out=np.zeros(len(product_ids)), where=sxx > 0)
+
+    lowest = np.full(len(product_ids), np.nan)
+    highest = np.full(len(product_ids), np.nan)
+    filled = counts > 0
+    if filled.any():     # empty windows add no elements, so consecutive starts bound each group
+        lowest[filled] = np.minimum.reduceat(y, starts[filled])
+        highest[filled] = np.maximum.reduceat(y, starts[filled])
+    last = y[np.maximum(ends - 1, 0)] if len(y) else lowest
+
+    return {
+        pid: _recommend(float(slope[i]), float(last[i]), float(lowest[i]), float(highest[i]))
+        if counts[i] >= 3 else dict(NOT_ENOUGH_HISTORY)
+        for i, pid in enumerate(product_ids)
+    }
+
+
+# ── Incremental state ─────────────────────────────────────────────────────
+class TrendWindow:
+    """
+    One product's checks inside the sliding window with their regression
+    sums. x is the check's sequence number, so the slope is the same as
+    regressing on the position within the window. Σx and Σx² stay exact
+    ints; the float sums are recomputed every RESUM_EVERY updates.
+    """
+    __slots__ = ('checks', 'lows', 'highs', 'next_x', 'n', 'sx', 'sxx', 'sy', 'sxy', 'updates')
+
+    def __init__(self):
+        self.checks = deque()   # (x, epoch seconds, price), oldest first
+        self.lows = deque()     # (x, price) with rising prices: lows[0] is the window minimum
+        self.highs = deque()    # (x, price) with falling prices: highs[0] is the window maximum
+        self.next_x = 0
+        self.n = self.sx = self.sxx = 0
+        self.sy = self.sxy = 0.0
+        self.updates = 0
+
+    @property
+    def last_time(self):
+        return self.checks[-1][1] if self.checks else None
+
+    def push(self, t: int, price: float):
+        x = self.next_x
+        self.next_x += 1
+        self.checks.append((x, t, price))
+        self.n += 1
+        self.sx += x
+        self.sxx += x * x
+        self.sy += price
+        self.sxy += x * price
+        while self.lows and self.lows[-1][1] >= price:
+            self.lows.pop()
+        self.lows.append((x, price))
+        while self.highs and self.highs[-1][1] <= price:
+            self.highs.pop()
+        self.highs.append((x, price))
+        self._updated()
+
+    def evict(self, since: int):
+        """Drops checks older than `since` (epoch seconds)."""
+        while self.checks and self.checks[0][1] < since:
+            x, _, price = self.checks.popleft()
+            self.n -= 1
+            self.sx -= x
+            self.sxx -= x * x
+            self.sy -= price
+            self.sxy -= x * price
+            if self.lows[0][0] == x:
+                self.lows.popleft()
+            if self.highs[0][0] == x:
+                self.highs.popleft()
+            self._updated()
+
+    def _updated(self):
+        self.updates += 1
+        if self.updates % RESUM_EVERY == 0:
+            self._resum()
+
+    def _resum(self):
+        """Renumbers x from 0 and recomputes the sums, so float error cannot build up."""
+        base = self.checks[0][0] if self.checks else self.next_x
+        self.checks = deque((x - base, t, p) for x, t, p in self.checks)
+        self.lows = deque((x - base, p) for x, p in self.lows)
+        self.highs = deque((x - base, p) for x, p in self.highs)
+        self.next_x -= base
+        self.n = len(self.checks)
+        self.sx = sum(x for x, _, _ in self.checks)
+        self.sxx = sum(x * x for x, _, _ in self.checks)
+        self.sy = sum(p for _, _, p in self.checks)
+        self.sxy = sum(x * p for x, _, p in self.checks)
+
+    def predict(self) -> dict:
+        if self.n < 3:
+            return dict(NOT_ENOUGH_HISTORY)
+        den = self.n * self.sxx - self.sx * self.sx
+        slope = (self.n * self.sxy - self.sx * self.sy) / den if den else 0
+        return _recommend(slope, self.checks[-1][2], self.lows[0][1], self.highs[0][1])
+
+
+class TrendState:
+    """
+    TrendWindows by product id. Only products that have been predicted
+    have state; checks for the others are ignored until they are.
+    """
+
+    def __init__(self, days: int = WINDOW_DAYS):
+        self.days = days
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _since(self) -> int:
+        return epoch(datetime.utcnow() - timedelta(days=self.days))
+
+    def update(self, product_id: int, price: float, checked_at: datetime):
+        """Pushes a newly committed check (history_store calls this after the commit)."""
+        t = epoch(checked_at)
+        price = float(np.float32(price))     # as the series store holds it
+        with self._lock:
+            window = self._windows.get(product_id)
+            if window is None:
+                return
+            last = window.last_time
+            if last is not None and t < last:
+                del self._windows[product_id]    # out of order: reseed on the next predict
+                return
+            if last == t and window.checks[-1][2] == price:
+                return                           # already read in by the seed
+            window.push(t, price)
+            window.evict(self._since())
+
+    def predict(self, product_id: int) -> dict:
+        since = self._since()
+        with self._lock:
+            window = self._windows.get(product_id)
+            if window is None:
+                window = self._windows[product_id] = self._seed(product_id, since)
+            window.evict(since)
+            return window.predict()
+
+    @staticmethod
+    def _seed(product_id: int, since: int) -> TrendWindow:
+        times, prices = series_store.series(product_id)
+        start = np.searchsorted(times, since)
+        window = TrendWindow()
+        for t, price in zip(times[start:].tolist(), prices[start:].tolist()):
+            window.push(t, price)
+        return window
+
+
+trend_state = TrendState()
@@ -0,0 +1,197 @@
+"""
+Price Series Store.
+Every product's price history as two NumPy arrays — check times (int64
+epoch seconds) and prices (float32) — read from memory-mapped files, so
+the predictor and dashboard work on array views instead of ORM rows.
+
+Layout in SERIES_DIR:
+  base.t / base.p   all series back to back, sorted by product then time
+  base.idx          offset index: rows of (product_id, start, length)
+  tail.pid / tail.t / tail.p
+                    append-only log of checks since the last rebuild
+Each check recorded through history_store is appended to the tail once its
+session commits. A daily rebuild (and one at startup) rewrites the base
+from the history store up to a cutoff. It keeps the tail rows from
+TAIL_MARGIN before that cutoff which the new base does not hold, since a
+check can commit after its product was streamed. A product's series is a
+zero-copy slice of the base, plus a small merged copy when it has tail rows.
+Until the first rebuild has run, reads fall back to the history store.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TIME = np.dtype('<i8')
+PRICE = np.dtype('<f4')
+PID = np.dtype('<i8')
+INDEX = np.dtype([('product_id', '<i8'), ('start', '<i8'), ('length', '<i8')])
+TAIL_MARGIN = 3600    # seconds before a rebuild's cutoff whose tail rows are kept unless in the base
+
+
+def epoch(dt: datetime) -> int:
+    return int((dt - datetime(1970, 1, 1)).total_seconds())
+
+
+def _map(path: str, dtype):
+    """Read-only memory map of a raw array file (an empty array for an empty file)."""
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+def _write(ft, fp, times: list, prices: list) -> int:
+    """Appends buffered values to the base files and clears the buffers; returns how many."""
+    n = len(times)
+    ft.write(np.array(times, TIME).tobytes())
+    fp.write(np.array(prices, PRICE).tobytes())
+    times.clear()
+    prices.clear()
+    return n
+
+
+class SeriesStore:
+
+    def __init__(self):
+        self.directory = None
+        self._base = None        # (times, prices, {product_id: (start, length)})
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = app.config.get('SERIES_DIR') if app.config.get('SERIES_STORE', True) else None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def ready(self) -> bool:
+        return self.directory is not None and os.path.exists(self._path('base.idx'))
+
+    def _load_base(self):
+        if self._base is None:
+            index = np.fromfile(self._path('base.idx'), dtype=INDEX)
+            self._base = (_map(self._path('base.t'), TIME), _map(self._path('base.p'), PRICE),
+                          {int(pid): (int(start), int(length)) for pid, start, length in index})
+        return self._base
+
+    def _tail(self):
+        """(product_ids, times, prices) appended since the last rebuild. Small; read as a copy."""
+        if not os.path.exists(self._path('tail.pid')):
+            return np.empty(0, PID), np.empty(0, TIME), np.empty(0, PRICE)
+        pids = np.fromfile(self._path('tail.pid'), dtype=PID)
+        times = np.fromfile(self._path('tail.t'), dtype=TIME)
+        prices = np.fromfile(self._path('tail.p'), dtype=PRICE)
+        n = min(len(pids), len(times), len(prices))     # ignore a half-written last record
+        return pids[:n], times[:n], prices[:n]
+
+    # ── Writes ────────────────────────────────────────────────────────────
+    def append(self, product_id: int, price: float, checked_at: datetime):
+        if not self.ready:
+            return
+        with self._lock:
+            for name, value in (('tail.t', np.array([epoch(checked_at)], TIME)),
+                                ('tail.p', np.array([price], PRICE)),
+                                ('tail.pid', np.array([product_id], PID))):
+                with open(self._path(name), 'ab') as f:
+                    f.write(value.tobytes())
+
+    def rebuild(self, chunk: int = 65536) -> int:
+        """Rewrites the base from the history store and trims the tail. Returns rows in the base."""
+        from app.models.models import db, Product
+        from app.services.history_store import history_store
+        cutoff = datetime.utcnow().replace(microsecond=0)    # base: checked_at < cutoff; tail: the rest
+        product_ids = db.session.execute(db.select(Product.id).order_by(Product.id)).scalars().all()
+        index, written = [], 0
+        with open(self._path('base.t.tmp'), 'wb') as ft, open(self._path('base.p.tmp'), 'wb') as fp:
+            for product_id in product_ids:
+                start = written
+                times, prices = [], []
+                for row in history_store.stream([product_id], until=cutoff, chunk=chunk):
+                    times.append(epoch(row.checked_at))
+                    prices.append(row.price)
+                    if len(times) >= chunk:
+                        written += _write(ft, fp, times, prices)
+                written += _write(ft, fp, times, prices)
+                if written > start:
+                    index.append((product_id, start, written - start))
+
+        with self._lock:
+            for name in ('base.t', 'base.p'):
+                os.replace(self._path(name + '.tmp'), self._path(name))
+            np.array(index, INDEX).tofile(self._path('base.idx.tmp'))
+            os.replace(self._path('base.idx.tmp'), self._path('base.idx'))
+            self._base = None
+            pids, times, prices = self._tail()
+            keep = self._not_in_base(pids, times, epoch(cutoff))
+            for name, values in (('tail.pid', pids[keep]), ('tail.t', times[keep]), ('tail.p', prices[keep])):
+                values.tofile(self._path(name))
+        return written
+
+    def _not_in_base(self, pids, times, cutoff: int):
+        """Mask of tail rows to keep: after `cutoff`, or within TAIL_MARGIN of it and missing from the base."""
+        keep = times >= cutoff - TAIL_MARGIN
+        base_t, _, offsets = self._load_base()
+        for i in np.flatnonzero(keep & (times < cutoff)):
+            start, length = offsets.get(int(pids[i]), (0, 0))
+            series = base_t[start:start + length]
+            j = np.searchsorted(series, times[i])
+            if j < len(series) and series[j] == times[i]:
+                keep[i] = False
+        return keep
+
+    # ── Reads ─────────────────────────────────────────────────────────────
+    def series_many(self, product_ids) -> dict:
+        """{product_id: (times, prices)} oldest first; base slices are zero-copy views."""
+        if not self.ready:
+            return self._from_history(product_ids)
+        with self._lock:
+            base_t, base_p, offsets = self._load_base()
+            tail_pids, tail_t, tail_p = self._tail()
+        result = {}
+        for pid in product_ids:
+            start, length = offsets.get(pid, (0, 0))
+            times, prices = base_t[start:start + length], base_p[start:start + length]
+            extra = tail_pids == pid
+            if extra.any():
+                times = np.concatenate([times, tail_t[extra]])
+                prices = np.concatenate([prices, tail_p[extra]])
+                if len(times) > 1 and np.any(times[1:] < times[:-1]):    # a check committed late
+                    order = np.argsort(times, kind='stable')
+                    times, prices = times[order], prices[order]
+            result[pid] = (times, prices)
+        return result
+
+    def series(self, product_id: int) -> tuple:
+        return self.series_many([product_id])[product_id]
+
+    @staticmethod
+    def _from_history(product_ids) -> dict:
+        from app.services.history_store import history_store
+        return {pid: (np.array([epoch(r.checked_at) for r in rows], TIME), np.array([r.price for r in rows], PRICE))
+                for pid, rows in history_store.series_many(list(product_ids)).items()}
+
+    def stats(self) -> dict:
+        if not self.ready:
+            return {'ready': False}
+        base_t, _, offsets = self._load_base()
+        return {'ready': True, 'products': len(offsets), 'base_rows': len(base_t),
+                'tail_rows': len(self._tail()[0])}
+
+
+def run_rebuild(app):
+    """Scheduler job: rebuild the series base from price history."""
+    with app.app_context():
+        if not series_store.directory:
+            return
+        started = time.monotonic()
+        rows = series_store.rebuild()
+        logger.info(f"📈 Series store rebuilt: {rows:,} checks in {time.monotonic() - started:.1f}s")
+
+
+series_store = SeriesStore()
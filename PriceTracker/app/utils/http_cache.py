@@ -0,0 +1,57 @@
+"""
+Conditional GET Helpers.
+`@conditional(scope)` gives a view an ETag and Last-Modified built from
+the data versions of the user / products it shows, and answers
+If-None-Match / If-Modified-Since with 304 before the view runs.
+`scope(**view_args)` returns (user_id, product_ids) and must be cheap.
+Both validators come from the stored data versions, so they agree across
+worker processes and restarts; If-Modified-Since is only honoured when a
+stored changed_at gives the Last-Modified.
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import request, session, current_app, make_response
+from app.services.data_version import data_versions
+
+
+def validators(user_id=None, product_ids=()) -> tuple:
+    """(etag, last_modified) for the current URL over the given data."""
+    tag, last_modified = data_versions.stamp(user_id, product_ids)
+    etag = hashlib.sha1(f'{tag}|{user_id}|{request.full_path}'.encode()).hexdigest()[:24]
+    return etag, last_modified
+
+
+def is_fresh(etag: str, last_modified) -> bool:
+    """True if the client's cached copy is current. If-None-Match wins over If-Modified-Since."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is None or last_modified is None:
+        return False
+    return last_modified.replace(tzinfo=timezone.utc) <= since
+
+
+def conditional(scope):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # pending flash messages belong in the body, so never answer those from cache
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            etag, last_modified = validators(*scope(**kwargs))
+            if is_fresh(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
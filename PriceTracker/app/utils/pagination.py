@@ -0,0 +1,88 @@
+"""
+Keyset Pagination Helpers.
+Shared by the REST endpoints: opaque cursors, `limit`, `since` / `until`
+and `fields` query parameters. A cursor holds the sort key of the last
+row returned, so the next page is an indexed range scan
+(`WHERE key > cursor ORDER BY key LIMIT n`) no matter how deep it is.
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+class PaginationError(ValueError):
+    """Bad pagination / filter parameter; endpoints answer 400."""
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Decodes a cursor into values of the given types (datetime / int / ...)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            raise ValueError
+        return tuple(datetime.fromisoformat(v) if t is datetime else t(v) for t, v in zip(types, values))
+    except (ValueError, TypeError):
+        raise PaginationError('invalid cursor')
+
+
+def parse_limit(args, default: int, maximum: int) -> int:
+    try:
+        limit = int(args.get('limit', default))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+
+def parse_time(args, name: str):
+    """`since` / `until` as ISO-8601 date or datetime, or None."""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise PaginationError(f'{name} must be an ISO-8601 date/time')
+
+
+def parse_fields(args, allowed, default) -> tuple:
+    """Comma-separated `fields` restricted to `allowed`; `default` if absent."""
+    value = args.get('fields')
+    if not value:
+        return tuple(default)
+    fields = tuple(f.strip() for f in value.split(',') if f.strip())
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise PaginationError(f"unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def after(columns, values, descending: bool = False):
+    """
+    Keyset condition "row comes after (values)" for ORDER BY columns,
+    written out as OR/AND so SQLite can use the composite index.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], step))
+    return or_(*clauses)
+
+
+def page(rows: list, limit: int, cursor_of, serialize) -> dict:
+    """
+    Response envelope. `rows` should hold up to limit + 1 rows; the extra row
+    only signals that another page exists.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'items': [serialize(r) for r in rows],
+        'next_cursor': cursor_of(rows[-1]) if has_more and rows else None,
+    }
@@ -0,0 +1,47 @@
+"""
+Email render benchmark.
+Measures how many price-drop alerts, 20-item alert digests and 500-row
+daily summaries the precompiled templates render per second.
+
+    python bench_email_render.py [seconds_per_case]
+"""
+import sys
+import time
+from app.email import render
+
+
+def _bench(label: str, fn, seconds: float):
+    fn()    # first call compiles the template
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    elapsed = time.perf_counter() - start
+    size = len(fn())
+    print(f"{label:<28} {count / elapsed:>10,.0f} renders/s  {elapsed / count * 1e3:>8.3f} ms  {size:>8,} bytes")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+
+    started = time.perf_counter()
+    render.warm()
+    print(f"compiled {len(render.TEMPLATES)} templates in {(time.perf_counter() - started) * 1e3:.1f} ms\n")
+
+    events = [{'kind': 'target' if i % 5 == 0 else 'drop', 'product_name': f'Product {i} — Wireless Headphones',
+               'url': f'https://www.amazon.in/dp/B0{i:08d}', 'old_price': 4999.0 + i, 'new_price': 3999.0 + i,
+               'drop_pct': 20.0} for i in range(20)]
+    products = [{'name': f'Product {i} — Running Shoes <Men>', 'current_price': 2499.0 + i if i % 7 else None,
+                 'trend': ('down', 'up', 'flat')[i % 3]} for i in range(500)]
+
+    _bench('price drop alert', lambda: render.render(
+        'price_drop', product_name='Apple iPhone 15 (Black, 128 GB)', old_price=79900.0, new_price=64999.0,
+        diff=14901.0, diff_pct=18.6, url='https://www.flipkart.com/p/itm6ac6485515ae4'), seconds)
+    _bench('alert digest (20 items)', lambda: render.render('alert_digest', name='Asha', events=events), seconds)
+    _bench('daily summary (500 rows)', lambda: render.render(
+        'daily_summary', name='Asha', products=products, dashboard_url='http://127.0.0.1:5000'), seconds)
+
+
+if __name__ == '__main__':
+    main()
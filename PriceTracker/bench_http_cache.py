@@ -0,0 +1,91 @@
+"""
+Conditional GET benchmark.
+Builds a throwaway SQLite database (one user tracking a few products with
+long price histories) and compares full responses against 304 revalidations
+for the JSON API and the dashboard, then bumps a product to check that the
+ETag changes.
+
+    python bench_http_cache.py [requests_per_case] [history_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from config import Config
+from app import create_app
+from app.models.models import db, upgrade_schema, User, Product, PriceHistory
+from app.services.data_version import data_versions
+
+PRODUCTS = 10
+
+
+def _seed(history_rows: int) -> int:
+    user = User(email='bench@example.com', name='Bench')
+    user.set_password('bench-password')
+    db.session.add(user)
+    start = datetime.utcnow() - timedelta(hours=history_rows)
+    for i in range(PRODUCTS):
+        product = Product(url=f'https://www.amazon.in/dp/B0{i:08d}', product_name=f'Product {i}', last_price=999.0)
+        user.tracked_products.append(product)
+        db.session.flush()
+        db.session.bulk_insert_mappings(PriceHistory, [
+            {'product_id': product.id, 'price': 999.0 + (j * 37 % 101), 'checked_at': start + timedelta(hours=j)}
+            for j in range(history_rows)])
+    db.session.commit()
+    return user.id
+
+
+def _bench(label: str, client, url: str, count: int, etag: str = None):
+    headers = {'If-None-Match': etag} if etag else {}
+    response = client.get(url, headers=headers)
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(url, headers=headers)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {response.status_code}  {elapsed / count * 1e3:>8.3f} ms  {len(response.data):>9,} bytes")
+    return response.headers.get('ETag')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    history_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+
+    app = create_app(BenchConfig)
+    try:
+        with app.app_context():
+            db.create_all()
+            upgrade_schema()
+            user_id = _seed(history_rows)
+            product_id = Product.query.first().id
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+        print(f"{PRODUCTS} products x {history_rows:,} price checks, {count} requests per case\n")
+        for label, url in (('/api/prices/<id>', f'/api/prices/{product_id}?limit=5000'),
+                           ('/api/products', '/api/products'),
+                           ('dashboard', '/')):
+            etag = _bench(f'{label} (full)', client, url, count)
+            _bench(f'{label} (If-None-Match)', client, url, count, etag)
+
+        url = f'/api/prices/{product_id}'
+        etag = client.get(url).headers.get('ETag')
+        with app.app_context():
+            data_versions.bump_products([product_id])
+        status = client.get(url, headers={'If-None-Match': etag}).status_code
+        print(f"\nafter a check run bumps the product: {status} (expected 200)")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
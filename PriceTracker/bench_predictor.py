@@ -0,0 +1,97 @@
+"""
+Trend prediction benchmark.
+Builds a throwaway SQLite database and series store (a catalog of products
+with a few weeks of price checks each, falling, rising and flat), then
+times the per-product recomputation from the series, one predict_many()
+call and the incremental trend_state (cold, then warm), checks that they
+all agree, then records one more check per product and checks again.
+
+    python bench_predictor.py [products] [checks_per_product]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from config import Config
+from app import create_app
+from app.models.models import db, upgrade_schema, Product, PriceHistory
+from app.services.history_store import history_store
+from app.services.price_predictor import _predict_from_series, predict_many, trend_state, WINDOW_DAYS
+from app.services.series_store import series_store
+
+
+def _seed(products: int, checks: int) -> list:
+    start = datetime.utcnow() - timedelta(days=21)
+    step = timedelta(days=21) / checks
+    ids = []
+    for i in range(products):
+        product = Product(url=f'https://www.amazon.in/dp/B0{i:08d}', product_name=f'Product {i}', last_price=999.0)
+        db.session.add(product)
+        db.session.flush()
+        drift = (-12, 0, 9)[i % 3]
+        db.session.bulk_insert_mappings(PriceHistory, [
+            {'product_id': product.id, 'price': 4999.0 + drift * j + (j * 37 + i) % 101,
+             'checked_at': start + step * j}
+            for j in range(checks)])
+        ids.append(product.id)
+    db.session.commit()
+    return ids
+
+
+def _timed(label: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<28} {(time.perf_counter() - started) * 1e3:>9.1f} ms")
+    return result
+
+
+def _diff(a: dict, b: dict) -> int:
+    return sum(a[pid] != b[pid] for pid in b)
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    checks = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    series_dir = tempfile.mkdtemp()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        SERIES_DIR = series_dir
+
+    app = create_app(BenchConfig)
+    try:
+        with app.app_context():
+            db.create_all()
+            upgrade_schema()
+            ids = _seed(products, checks)
+            series_store.rebuild()
+            print(f"{products:,} products x {checks:,} price checks\n")
+
+            scalar = _timed('recomputed per product', lambda: {pid: _predict_from_series(pid, WINDOW_DAYS) for pid in ids})
+            batch = _timed('predict_many (one batch)', lambda: predict_many(ids))
+            _timed('trend_state (seeding)', lambda: {pid: trend_state.predict(pid) for pid in ids})
+            online = _timed('trend_state (warm)', lambda: {pid: trend_state.predict(pid) for pid in ids})
+
+            counts = {}
+            for result in batch.values():
+                counts[result['recommendation']] = counts.get(result['recommendation'], 0) + 1
+            print(f"\nrecommendations: {', '.join(f'{k} {v:,}' for k, v in sorted(counts.items()))}")
+            print(f"mismatches vs batch: recomputed {_diff(scalar, batch)}, trend_state {_diff(online, batch)} (expected 0)")
+
+            for i, pid in enumerate(ids):
+                history_store.record(pid, 3999.0 + i % 7)
+            db.session.commit()
+            online = {pid: trend_state.predict(pid) for pid in ids}
+            print(f"after one more check each: trend_state {_diff(online, predict_many(ids))} mismatches (expected 0)")
+    finally:
+        os.remove(path)
+        shutil.rmtree(series_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,83 @@ class Config:
     # Email Settings
     EMAIL_USER = os.environ.get('EMAIL_USER')
     EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD')
+
+    # Public base URL used for links in emails
+    APP_URL = os.environ.get('APP_URL', 'http://127.0.0.1:5000')
+
+    # SMTP server (point at a local stand-in such as `python -m aiosmtpd -n -l localhost:1025`
+    # with SMTP_USE_TLS=0 and SMTP_USE_AUTH=0 for testing)
+    SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+    SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', '1') == '1'
+    SMTP_USE_AUTH = os.environ.get('SMTP_USE_AUTH', '1') == '1'
+
+    # Email outbox: batch size per SMTP connection, send rate, retries, drain interval (s)
+    EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 50))
+    EMAIL_RATE_PER_MIN = int(os.environ.get('EMAIL_RATE_PER_MIN', 60))
+    EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 5))
+    OUTBOX_DRAIN_SECONDS = int(os.environ.get('OUTBOX_DRAIN_SECONDS', 30))
+
+    # Price alerts are sent as one digest per user per check run; mega (30%+) drops
+    # are emailed straight away unless this is 0
+    EMAIL_MEGA_IMMEDIATE = os.environ.get('EMAIL_MEGA_IMMEDIATE', '1') == '1'
+
+    # Daily summary email: hour of day (server time, -1 disables), users per batch, time budget (s)
+    DAILY_SUMMARY_HOUR = int(os.environ.get('DAILY_SUMMARY_HOUR', 9))
+    DAILY_SUMMARY_BATCH = int(os.environ.get('DAILY_SUMMARY_BATCH', 1000))
+    DAILY_SUMMARY_MAX_SECONDS = int(os.environ.get('DAILY_SUMMARY_MAX_SECONDS', 1800))
     
+    # Scraper egress: comma-separated proxy URLs and/or local source addresses,
+    # e.g. "http://127.0.0.1:8081,local:10.0.0.5". Empty = direct only.
+    SCRAPER_EGRESS = [e.strip() for e in os.environ.get('SCRAPER_EGRESS', '').split(',') if e.strip()]
+
+    # Seconds a successful scrape is reused by /add, force_check and the scheduler
+    SCRAPE_CACHE_TTL = int(os.environ.get('SCRAPE_CACHE_TTL', 300))
+
+    # Max seconds a cached unread count / bell dropdown can lag behind the DB
+    NOTIFICATION_CACHE_TTL = int(os.environ.get('NOTIFICATION_CACHE_TTL', 300))
+
+    # Live updates (/api/events): open streams per process (each holds a worker thread unless
+    # running under gevent / an async worker), seconds before a stream is closed for reconnect,
+    # and the Retry-After given to clients turned away (they poll meanwhile)
+    SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', 50))
+    SSE_MAX_LIFETIME = int(os.environ.get('SSE_MAX_LIFETIME', 300))
+    SSE_RETRY_AFTER = int(os.environ.get('SSE_RETRY_AFTER', 60))
+
+    # Notification retention (daily at NOTIFICATION_RETENTION_HOUR): read notifications older
+    # than N days are moved to notifications_archive (or deleted if NOTIFICATION_ARCHIVE=0)
+    NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 30))
+    NOTIFICATION_RETENTION_HOUR = int(os.environ.get('NOTIFICATION_RETENTION_HOUR', 3))
+    NOTIFICATION_ARCHIVE = os.environ.get('NOTIFICATION_ARCHIVE', '1') == '1'
+    RETENTION_BATCH = int(os.environ.get('RETENTION_BATCH', 500))
+
+    # Chart point budgets: product detail chart (LTTB) and dashboard sparklines (min/max buckets)
+    CHART_POINTS = int(os.environ.get('CHART_POINTS', 300))
+    SPARKLINE_POINTS = int(os.environ.get('SPARKLINE_POINTS', 60))
+    # Newest price checks listed on the product page; older ones load a page at a time
+    HISTORY_TABLE_ROWS = int(os.environ.get('HISTORY_TABLE_ROWS', 50))
+
+    # Rows per database fetch / response chunk for streamed exports
+    EXPORT_CHUNK = int(os.environ.get('EXPORT_CHUNK', 1000))
+
+    # Optional month-partitioned price history: one SQLite file per month in HISTORY_PARTITION_DIR.
+    # Existing rows are moved over by the daily retention job; months older than
+    # HISTORY_RETENTION_MONTHS (0 = keep forever) are dropped there too.
+    HISTORY_PARTITIONED = os.environ.get('HISTORY_PARTITIONED', '0') == '1'
+    HISTORY_PARTITION_DIR = os.environ.get('HISTORY_PARTITION_DIR', os.path.join(basedir, 'history'))
+    HISTORY_RETENTION_MONTHS = int(os.environ.get('HISTORY_RETENTION_MONTHS', 0))
+
+    # Memory-mapped NumPy price series (predictor, dashboard stats), rebuilt daily at
+    # SERIES_REBUILD_HOUR and on startup; new checks are appended as they happen
+    SERIES_STORE = os.environ.get('SERIES_STORE', '1') == '1'
+    SERIES_DIR = os.environ.get('SERIES_DIR', os.path.join(basedir, 'series'))
+    SERIES_REBUILD_HOUR = int(os.environ.get('SERIES_REBUILD_HOUR', 2))
+
+    # Columnar (Arrow IPC) archive of price history for analytics, one file per month,
+    # written daily at HISTORY_ARCHIVE_HOUR (-1 disables); compression: none (zero-copy reads), zstd or lz4
+    HISTORY_ARCHIVE_DIR = os.environ.get('HISTORY_ARCHIVE_DIR', os.path.join(basedir, 'archive'))
+    HISTORY_ARCHIVE_COMPRESSION = os.environ.get('HISTORY_ARCHIVE_COMPRESSION', 'none')
+    HISTORY_ARCHIVE_HOUR = int(os.environ.get('HISTORY_ARCHIVE_HOUR', 4))
+
     # Scheduler Settings (hours)
     CHECK_INTERVAL = int(os.environ.get('CHECK_INTERVAL', 6))
@@ -0,0 +1,60 @@
+from bisect import bisect_left
+from sqlalchemy import select
+from .database import User, user_product
+
+DROP_ALERT_PCT = 5.0   # drop / rise size that alerts every tracker
+RISE_ALERT_PCT = 5.0
+
+
+class ProductRules:
+    """Trackers of one product, with (target_price, user_id, email) kept sorted."""
+
+    __slots__ = ("targets", "users")
+
+    def __init__(self):
+        self.targets = []
+        self.users = []      # (user_id, email)
+
+    def matches(self, old_price: float, new_price: float) -> list:
+        """[(user_id, email, kind)] for a price change; kind is 'target', 'drop' or 'rise'."""
+        # target hit: target >= new_price, found with one binary search
+        hits = [(user_id, email, "target")
+                for _, user_id, email in self.targets[bisect_left(self.targets, (new_price,)):]]
+        if old_price is None:
+            return hits
+        drop_pct = (old_price - new_price) / old_price * 100 if new_price < old_price else 0
+        rise_pct = (new_price - old_price) / old_price * 100 if new_price > old_price else 0
+        kind = "drop" if drop_pct >= DROP_ALERT_PCT else ("rise" if rise_pct >= RISE_ALERT_PCT else None)
+        if kind:
+            hit = {user_id for user_id, _, _ in hits}
+            hits += [(user_id, email, kind) for user_id, email in self.users if user_id not in hit]
+        return hits
+
+
+class AlertRuleIndex:
+    """Alert rules of every active (not paused) tracker, loaded with one query per run."""
+
+    def __init__(self):
+        self._rules: dict[int, ProductRules] = {}
+
+    @classmethod
+    def load(cls, db, product_ids=None):
+        query = (select(user_product.c.product_id, user_product.c.user_id, user_product.c.target_price, User.email)
+                 .join(User, User.id == user_product.c.user_id)
+                 .where((user_product.c.is_paused == 0) | user_product.c.is_paused.is_(None)))
+        if product_ids is not None:
+            query = query.where(user_product.c.product_id.in_(product_ids))
+
+        index = cls()
+        for product_id, user_id, target, email in db.execute(query):
+            rules = index._rules.setdefault(product_id, ProductRules())
+            rules.users.append((user_id, email))
+            if target:
+                rules.targets.append((target, user_id, email))
+        for rules in index._rules.values():
+            rules.targets.sort()
+        return index
+
+    def matches(self, product_id: int, old_price: float, new_price: float) -> list:
+        rules = self._rules.get(product_id)
+        return rules.matches(old_price, new_price) if rules else []
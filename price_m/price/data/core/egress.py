@@ -0,0 +1,118 @@
+import time
+import random
+import threading
+
+DIRECT = "direct"
+
+
+class Egress:
+    """One way out: a proxy URL, a local source address, or the default route."""
+
+    def __init__(self, proxy: str = None, local_address: str = None):
+        self.proxy = proxy
+        self.local_address = local_address
+        self.id = proxy or (f"local:{local_address}" if local_address else DIRECT)
+        self.requests = 0
+        self.successes = 0
+        self.bytes = 0
+        self.started_at = time.time()
+
+    def throughput(self) -> dict:
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "bytes": self.bytes,
+            "requests_per_min": round(self.requests / elapsed * 60, 2),
+            "kb_per_s": round(self.bytes / elapsed / 1024, 2),
+        }
+
+
+class EgressHealth:
+    """EWMA success rate and latency of one egress against one domain."""
+    __slots__ = ("success", "latency", "failures_in_row", "cooldown_until")
+
+    def __init__(self):
+        self.success = 1.0
+        self.latency = 1.0
+        self.failures_in_row = 0
+        self.cooldown_until = 0.0
+
+    def score(self) -> float:
+        # Healthy and fast scores high; a 50% success rate halves the weight
+        return self.success ** 2 / (self.latency + 0.25)
+
+    def to_dict(self) -> dict:
+        return {
+            "success_rate": round(self.success, 3),
+            "latency_s": round(self.latency, 3),
+            "cooling_down": self.cooldown_until > time.monotonic(),
+        }
+
+
+class EgressPool:
+    """
+    Rotates requests across configured egresses, preferring the ones with the
+    best recent success rate and latency for the target domain. An egress
+    that fails several times in a row sits out for a cooldown period.
+    """
+
+    def __init__(self, egresses: list, alpha: float = 0.2,
+                 max_failures: int = 3, cooldown: float = 120.0):
+        self.egresses = egresses or [Egress()]
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._health: dict[tuple, EgressHealth] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, egress_config: list) -> "EgressPool":
+        """egress_config: [{"proxy": "http://127.0.0.1:8081"}, {"local_address": "10.0.0.5"}, ...]"""
+        egresses = [Egress(proxy=e.get("proxy"), local_address=e.get("local_address"))
+                    for e in egress_config or []]
+        return cls(egresses)
+
+    def _health_for(self, egress: Egress, domain: str) -> EgressHealth:
+        key = (egress.id, domain)
+        health = self._health.get(key)
+        if health is None:
+            health = self._health.setdefault(key, EgressHealth())
+        return health
+
+    def choose(self, domain: str, exclude: Egress = None) -> Egress:
+        """Weighted random pick by health score, skipping egresses in cooldown."""
+        now = time.monotonic()
+        candidates = [e for e in self.egresses if e is not exclude] or self.egresses
+        ready = [e for e in candidates if self._health_for(e, domain).cooldown_until <= now]
+        candidates = ready or candidates
+        if len(candidates) == 1:
+            return candidates[0]
+        weights = [self._health_for(e, domain).score() for e in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+    def record(self, egress: Egress, domain: str, ok: bool, elapsed: float, nbytes: int = 0):
+        with self._lock:
+            health = self._health_for(egress, domain)
+            health.success += self.alpha * ((1.0 if ok else 0.0) - health.success)
+            health.latency += self.alpha * (elapsed - health.latency)
+            egress.requests += 1
+            egress.bytes += nbytes
+            if ok:
+                egress.successes += 1
+                health.failures_in_row = 0
+            else:
+                health.failures_in_row += 1
+                if health.failures_in_row >= self.max_failures:
+                    health.cooldown_until = time.monotonic() + self.cooldown
+                    health.failures_in_row = 0
+
+    def stats(self) -> dict:
+        report = {}
+        for egress in self.egresses:
+            report[egress.id] = {
+                **egress.throughput(),
+                "domains": {domain: h.to_dict() for (eid, domain), h in self._health.items()
+                            if eid == egress.id},
+            }
+        return report
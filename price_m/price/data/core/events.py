@@ -0,0 +1,92 @@
+import asyncio
+import json
+from collections import deque
+
+HEARTBEAT_SECONDS = 20
+BUFFER_SIZE = 50
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def product_topic(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+class Subscription:
+    """One SSE client's bounded buffer; the oldest events are dropped when it falls behind."""
+
+    def __init__(self, topics, maxsize: int = BUFFER_SIZE):
+        self.topics = frozenset(topics)
+        self._events = deque(maxlen=maxsize)
+        self._wake = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, event: tuple):
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+        self._wake.set()
+
+    async def get(self, timeout: float):
+        """Next (event_type, data), or None after `timeout` seconds without one."""
+        if not self._events:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._wake.clear()
+        return self._events.popleft() if self._events else None
+
+
+class EventBus:
+    """In-process pub/sub: topic -> subscriptions. Used from the event loop only."""
+
+    def __init__(self):
+        self._topics: dict[str, set] = {}
+        self.published = 0
+
+    def subscribe(self, topics) -> Subscription:
+        sub = Subscription(topics)
+        for topic in sub.topics:
+            self._topics.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        for topic in sub.topics:
+            subs = self._topics.get(topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._topics[topic]
+
+    def publish(self, topic: str, event_type: str, data: dict) -> int:
+        subs = self._topics.get(topic, ())
+        for sub in subs:
+            sub.put((event_type, data))
+        self.published += 1
+        return len(subs)
+
+    def stats(self) -> dict:
+        subs = {s for group in self._topics.values() for s in group}
+        return {"subscribers": len(subs), "topics": len(self._topics),
+                "published": self.published, "dropped": sum(s.dropped for s in subs)}
+
+
+async def sse_stream(bus: EventBus, sub: Subscription):
+    """Async generator of SSE frames; unsubscribes when the client disconnects."""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            event = await sub.get(HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": ping\n\n"
+                continue
+            event_type, data = event
+            yield f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+    finally:
+        bus.unsubscribe(sub)
+
+
+event_bus = EventBus()
@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import (MetaData, Table, Column, Integer, Float, DateTime, Index,
+                        create_engine, select, insert, delete, text, event)
+from sqlalchemy.orm import Session
+from .database import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+ID_STRIDE = 10 ** 10
+PENDING = "history_store.pending"     # session.info key: month-file rows waiting for the commit
+
+_partition_metadata = MetaData()
+PARTITION = Table(
+    "price_history", _partition_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("product_id", Integer, nullable=False),
+    Column("price", Float, nullable=False),
+    Column("timestamp", DateTime, nullable=False),
+    Index("ux_price_history_product_timestamp", "product_id", "timestamp", unique=True),
+    sqlite_autoincrement=True,
+)
+
+
+def _ensure_unique(engine):
+    """Month files made before the unique index get it, after dropping duplicate checks."""
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'index' "
+                             "AND name = 'ux_price_history_product_timestamp'")).first():
+            return
+        conn.execute(text("DELETE FROM price_history WHERE id NOT IN "
+                          "(SELECT MIN(id) FROM price_history GROUP BY product_id, timestamp)"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_price_history_product_timestamp"))
+        conn.execute(text("CREATE UNIQUE INDEX ux_price_history_product_timestamp "
+                          "ON price_history (product_id, timestamp)"))
+
+
+def _month_start(month: str) -> datetime:
+    return datetime.strptime(month, "%Y-%m")
+
+
+def _next_month(start: datetime) -> datetime:
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+class HistoryStore:
+    """
+    Price history reads and writes. Unpartitioned it is the price_history table in
+    tracker.db; with config history.partitioned, rows go to one SQLite file per month
+    (price_history_YYYY_MM.db) and a month is dropped by deleting its file. Rows still
+    in tracker.db are read as the oldest partition until migrate_legacy() moves them.
+    Reads given since/until open only the month files that range overlaps.
+    A month-file row is written once the caller's session commits (never if it rolls
+    back); the insert ignores duplicates on (product_id, timestamp), so a replay is
+    harmless, and a failed write is retried after the next commit.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self._engines = {}
+        self._legacy = None
+        self._unwritten = []     # committed checks whose month-file write failed
+        self._lock = threading.Lock()
+
+    def configure(self, cfg: dict, base_dir: str):
+        if cfg.get("partitioned"):
+            self.directory = os.path.join(base_dir, cfg.get("directory", "history"))
+            os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def partitioned(self) -> bool:
+        return self.directory is not None
+
+    def _path(self, month: str) -> str:
+        return os.path.join(self.directory, f"price_history_{month.replace('-', '_')}.db")
+
+    def months(self) -> list:
+        if not self.partitioned:
+            return []
+        return sorted(f[len("price_history_"):-3].replace("_", "-") for f in os.listdir(self.directory)
+                      if f.startswith("price_history_") and f.endswith(".db"))
+
+    def _engine(self, month: str):
+        with self._lock:
+            engine = self._engines.get(month)
+            if engine is None:
+                path = self._path(month)
+                is_new = not os.path.exists(path)
+                engine = create_engine(f"sqlite:///{path}")
+                if is_new:
+                    _partition_metadata.create_all(engine)
+                    start = _month_start(month)
+                    with engine.begin() as conn:
+                        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('price_history', :seq)"),
+                                     {"seq": (start.year * 100 + start.month) * ID_STRIDE})
+                else:
+                    _ensure_unique(engine)
+                self._engines[month] = engine
+            return engine
+
+    def _sources(self, db, newest_first: bool = False, since: datetime = None, until: datetime = None) -> list:
+        """[(table, execute)] that can hold rows in [since, until) — tracker.db's price_history
+        (while it has rows), then the overlapping month files."""
+        main = (PriceHistory.__table__, lambda stmt: db.execute(stmt).all())
+        if not self.partitioned:
+            return [main]
+        if self._legacy is None:
+            self._legacy = db.execute(select(PriceHistory.id).limit(1)).first() is not None
+        sources = [main] if self._legacy else []
+        for month in self.months():
+            start = _month_start(month)
+            if (since and _next_month(start) <= since) or (until and start >= until):
+                continue
+            sources.append((PARTITION, self._executor(self._engine(month))))
+        return sources[::-1] if newest_first else sources
+
+    @staticmethod
+    def _in_range(stmt, t, since, until):
+        if since:
+            stmt = stmt.where(t.c.timestamp >= since)
+        if until:
+            stmt = stmt.where(t.c.timestamp < until)
+        return stmt
+
+    @staticmethod
+    def _executor(engine):
+        def execute(stmt):
+            with engine.connect() as conn:
+                return conn.execute(stmt).all()
+        return execute
+
+    def record(self, db, product_id: int, price: float, timestamp: datetime = None):
+        """Part of `db`'s unit of work: unpartitioned the row is added to it; a month-file
+        row is written once `db` commits."""
+        timestamp = timestamp or datetime.utcnow()
+        if not self.partitioned:
+            db.add(PriceHistory(product_id=product_id, price=price, timestamp=timestamp))
+            return
+        db.info.setdefault(PENDING, []).append((product_id, price, timestamp))
+
+    def _write_partitions(self, checks):
+        """Inserts committed checks (plus earlier failed ones) into their month files."""
+        with self._lock:
+            checks, self._unwritten = self._unwritten + list(checks), []
+        by_month = {}
+        for check in checks:
+            by_month.setdefault(check[2].strftime("%Y-%m"), []).append(check)
+        for month, batch in by_month.items():
+            try:
+                with self._engine(month).begin() as conn:
+                    conn.execute(insert(PARTITION).prefix_with("OR IGNORE"),
+                                 [{"product_id": pid, "price": price, "timestamp": at} for pid, price, at in batch])
+            except Exception as e:
+                logger.error(f"Price history write to {month} failed, retrying after the next commit: {e}")
+                with self._lock:
+                    self._unwritten.extend(batch)
+
+    def latest(self, db, product_id: int, since: datetime = None, until: datetime = None):
+        """Most recent price of a product in [since, until), or None."""
+        for t, execute in self._sources(db, newest_first=True, since=since, until=until):
+            rows = execute(self._in_range(select(t.c.price).where(t.c.product_id == product_id), t, since, until)
+                           .order_by(t.c.timestamp.desc()).limit(1))
+            if rows:
+                return rows[0][0]
+        return None
+
+    def series_many(self, db, product_ids, since: datetime = None, until: datetime = None) -> dict:
+        """{product_id: rows (product_id, price, timestamp) in [since, until) oldest first},
+        one query per overlapping partition."""
+        result = {pid: [] for pid in product_ids}
+        if not result:
+            return result
+        for t, execute in self._sources(db, since=since, until=until):
+            for row in execute(self._in_range(select(t.c.product_id, t.c.price, t.c.timestamp)
+                                              .where(t.c.product_id.in_(list(result))), t, since, until)
+                               .order_by(t.c.product_id, t.c.timestamp)):
+                result[row.product_id].append(row)
+        return result
+
+    def drop_month(self, month: str):
+        with self._lock:
+            engine = self._engines.pop(month, None)
+            if engine is not None:
+                engine.dispose()
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                if os.path.exists(self._path(month) + suffix):
+                    os.remove(self._path(month) + suffix)
+
+    def drop_before(self, keep_months: int) -> list:
+        oldest = datetime.utcnow().replace(day=1)
+        for _ in range(keep_months - 1):
+            oldest = (oldest - timedelta(days=1)).replace(day=1)
+        dropped = [m for m in self.months() if m < oldest.strftime("%Y-%m")]
+        for month in dropped:
+            self.drop_month(month)
+        return dropped
+
+    def migrate_legacy(self, db, batch_size: int) -> int:
+        """Moves one batch of tracker.db price_history rows into month files."""
+        if not self.partitioned or self._legacy is False:
+            return 0
+        rows = db.execute(select(PriceHistory.id, PriceHistory.product_id, PriceHistory.price, PriceHistory.timestamp)
+                          .order_by(PriceHistory.id).limit(batch_size)).all()
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row.timestamp.strftime("%Y-%m"), []).append(
+                {"product_id": row.product_id, "price": row.price, "timestamp": row.timestamp})
+        for month, values in by_month.items():
+            with self._engine(month).begin() as conn:
+                conn.execute(insert(PARTITION).prefix_with("OR IGNORE"), values)
+        if rows:
+            db.execute(delete(PriceHistory).where(PriceHistory.id <= rows[-1].id))
+            db.commit()
+        self._legacy = len(rows) == batch_size
+        return len(rows)
+
+
+history_store = HistoryStore()
+
+
+@event.listens_for(Session, "after_commit")
+def _write_committed(session):
+    checks = session.info.pop(PENDING, ())
+    if history_store.partitioned and (checks or history_store._unwritten):
+        history_store._write_partitions(checks)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(PENDING, None)
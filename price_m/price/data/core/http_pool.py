@@ -0,0 +1,171 @@
+import time
+import logging
+import importlib.util
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+import httpx
+from .egress import Egress, EgressPool
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class OriginStats:
+    """Request counters for one origin."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_time = 0.0
+        self.created_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "avg_latency_ms": round(self.total_time / self.requests * 1000, 1) if self.requests else None,
+            "age_s": round(time.time() - self.created_at, 1),
+        }
+
+
+class ClientPool:
+    """
+    Application-lifetime pool of httpx.AsyncClient objects, one per origin
+    and egress, so keep-alive connections (and HTTP/2 streams) are reused
+    across runs instead of being rebuilt for every scrape.
+    """
+
+    def __init__(self, http2: bool = False, max_connections: int = 20,
+                 max_keepalive_connections: int = 10, keepalive_expiry: float = 30.0,
+                 egress: EgressPool = None):
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1.")
+            http2 = False
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.egress = egress or EgressPool([])
+        self._clients: dict[tuple, httpx.AsyncClient] = {}
+        self._stats: dict[str, OriginStats] = {}
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, http_config: dict) -> "ClientPool":
+        return cls(
+            http2=http_config.get("http2", False),
+            max_connections=http_config.get("max_connections", 20),
+            max_keepalive_connections=http_config.get("max_keepalive_connections", 10),
+            keepalive_expiry=http_config.get("keepalive_expiry", 30.0),
+            egress=EgressPool.from_config(http_config.get("egress", [])),
+        )
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+    def client_for(self, url: str, egress: Egress = None) -> httpx.AsyncClient:
+        """Returns the shared client for the URL's origin and egress, creating it on first use."""
+        if self._closed:
+            raise RuntimeError("ClientPool is closed")
+        egress = egress or self.egress.egresses[0]
+        origin = self.origin(url)
+        client = self._clients.get((egress.id, origin))
+        if client is None:
+            transport = httpx.AsyncHTTPTransport(
+                http2=self.http2,
+                limits=self.limits,
+                proxy=egress.proxy,
+                local_address=egress.local_address,
+            )
+            client = httpx.AsyncClient(transport=transport)
+            self._clients[(egress.id, origin)] = client
+            self._stats.setdefault(origin, OriginStats())
+        return client
+
+    def record(self, url: str, ok: bool, elapsed: float, nbytes: int = 0):
+        stats = self._stats.get(self.origin(url))
+        if stats is None:
+            return
+        stats.requests += 1
+        stats.total_time += elapsed
+        stats.bytes += nbytes
+        if not ok:
+            stats.errors += 1
+
+    def stats(self) -> dict:
+        """Per-origin request counters plus the number of pooled connections."""
+        report = {}
+        for origin, stats in self._stats.items():
+            entry = stats.to_dict()
+            entry["http2"] = self.http2
+            entry["open_connections"] = entry["idle_connections"] = 0
+            for (_, client_origin), client in self._clients.items():
+                if client_origin != origin:
+                    continue
+                # httpx doesn't expose its pool publicly; read it defensively
+                pool = getattr(getattr(client, "_transport", None), "_pool", None)
+                connections = getattr(pool, "connections", None) or []
+                entry["open_connections"] += len(connections)
+                entry["idle_connections"] += sum(1 for c in connections if c.is_idle())
+            report[origin] = entry
+        return report
+
+    async def aclose(self):
+        self._closed = True
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing HTTP client: {e}")
+
+
+# ── Application-lifetime pool ─────────────────────────────────────────────────
+_pool: ClientPool = None
+
+
+def get_pool() -> ClientPool:
+    return _pool
+
+
+def open_pool(http_config: dict) -> ClientPool:
+    """Creates the shared pool; called once at application startup."""
+    global _pool
+    if _pool is None:
+        _pool = ClientPool.from_config(http_config)
+        logger.info(f"HTTP client pool opened (http2={_pool.http2})")
+    return _pool
+
+
+async def close_pool():
+    """Closes the shared pool; called once at application shutdown."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.aclose()
+        logger.info("HTTP client pool closed")
+
+
+@asynccontextmanager
+async def borrow_pool(http_config: dict, pool: ClientPool = None):
+    """
+    Yields the given pool or the application pool. Scripts that run without
+    an application pool get a temporary one that is closed on exit.
+    """
+    pool = pool or _pool
+    if pool is not None:
+        yield pool
+        return
+    pool = ClientPool.from_config(http_config)
+    try:
+        yield pool
+    finally:
+        await pool.aclose()
@@ -0,0 +1,141 @@
+import bisect
+import threading
+
+# Bucket upper bounds in seconds, roughly 25% apart from 50ms to 60s
+BUCKET_BOUNDS = [round(0.05 * 1.25 ** i, 3) for i in range(33)]
+
+
+class LatencyHistogram:
+    """Fixed log-spaced latency histogram with percentile estimates."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+            self.total += 1
+            # Halve old counts now and then so the histogram follows the site
+            if self.total >= 2000:
+                self.counts = [c // 2 for c in self.counts]
+                self.total = sum(self.counts)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile, or None if empty."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else BUCKET_BOUNDS[-1]
+        return BUCKET_BOUNDS[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "samples": self.total,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class HedgeBudget:
+    """Allows hedged requests only while they stay under max_ratio of all requests."""
+
+    def __init__(self, max_ratio: float = 0.1):
+        self.max_ratio = max_ratio
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def note_request(self):
+        with self._lock:
+            self.requests += 1
+            if self.requests >= 10000:
+                self.requests //= 2
+                self.hedges //= 2
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+
+class Deadlines:
+    """Per-attempt connect / first-byte / total deadlines in seconds."""
+    __slots__ = ("connect", "first_byte", "total")
+
+    def __init__(self, connect: float, first_byte: float, total: float):
+        self.connect = connect
+        self.first_byte = first_byte
+        self.total = total
+
+    def to_dict(self) -> dict:
+        return {"connect": self.connect, "first_byte": self.first_byte, "total": self.total}
+
+
+class LatencyTracker:
+    """
+    Per-domain latency histograms and the deadlines/hedge thresholds they drive.
+
+    config.json supplies the ceiling for each phase ("deadlines") and the
+    hedging policy ("hedging"). Once a domain has enough samples its total
+    deadline tightens to a multiple of the observed p99, and a hedged second
+    request is fired when an attempt outlives the observed p95.
+    """
+
+    def __init__(self, get_config):
+        # Called on every lookup so edits to config.json apply without a restart
+        self.get_config = get_config
+        self.budget = HedgeBudget()
+        self._histograms: dict[str, LatencyHistogram] = {}
+
+    def histogram(self, domain: str) -> LatencyHistogram:
+        hist = self._histograms.get(domain)
+        if hist is None:
+            hist = self._histograms.setdefault(domain, LatencyHistogram())
+        return hist
+
+    def observe(self, domain: str, seconds: float):
+        self.histogram(domain).observe(seconds)
+
+    def deadlines(self, domain: str) -> Deadlines:
+        deadline_config = self.get_config().get("deadlines", {})
+        cfg = {**deadline_config.get("default", {}), **deadline_config.get(domain, {})}
+        connect = cfg.get("connect", 5.0)
+        first_byte = cfg.get("first_byte", 10.0)
+        total = cfg.get("total", 20.0)
+
+        hist = self.histogram(domain)
+        if hist.total >= self.get_config().get("hedging", {}).get("min_samples", 20):
+            p99 = hist.percentile(0.99)
+            total = min(total, max(p99 * 3, connect + first_byte))
+        return Deadlines(connect, first_byte, total)
+
+    def hedge_delay(self, domain: str) -> float:
+        """Seconds after which an attempt should be hedged, or None to not hedge."""
+        hedging = self.get_config().get("hedging", {})
+        if not hedging.get("enabled", False):
+            return None
+        hist = self.histogram(domain)
+        if hist.total < hedging.get("min_samples", 20):
+            return None
+        self.budget.max_ratio = hedging.get("max_hedge_ratio", 0.1)
+        return hist.percentile(hedging.get("percentile", 0.95))
+
+    def stats(self) -> dict:
+        return {
+            "hedge_requests": self.budget.requests,
+            "hedges": self.budget.hedges,
+            "domains": {
+                domain: {**hist.to_dict(), "deadlines": self.deadlines(domain).to_dict(),
+                         "hedge_after": self.hedge_delay(domain)}
+                for domain, hist in self._histograms.items()
+            },
+        }
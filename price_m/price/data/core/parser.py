@@ -1,12 +1,12 @@
 import re
 from bs4 import BeautifulSoup
-import json
 import os
+from .selector_registry import SelectorRegistry
 
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config.json')
 
-with open(CONFIG_PATH, 'r') as f:
-    config = json.load(f)
+# Selectors are compiled once per domain and hot-reloaded when config.json changes
+registry = SelectorRegistry(CONFIG_PATH)
 
 def clean_price(price_str: str) -> float:
     """Removes currency symbols and commas from the price string and converts to float."""
@@ -21,25 +21,27 @@ def clean_price(price_str: str) -> float:
 
 def parse_product_html(html: str, domain: str) -> dict:
     """Parses HTML and extracts product title and price based on domain config."""
-    domain_config = config['domains'].get(domain)
-    if not domain_config:
+    selectors = registry.get(domain)
+    if not selectors:
         # Fallback to generic parsing if domain is not configured
         return {"name": None, "price": None}
 
     soup = BeautifulSoup(html, 'html.parser')
     
     # Extract Title
-    title_element = soup.select_one(domain_config['title_selector'])
+    title_element = selectors.title.select_one(soup)
+    selectors.record(selectors.title, title_element is not None)
     title = title_element.get_text(strip=True) if title_element else "Unknown Product"
 
-    # Extract Price
+    # Extract Price (selectors with the best hit rate are tried first)
     price = None
-    for selector in domain_config['price_selectors']:
-        price_element = soup.select_one(selector)
+    for selector in selectors.price_selectors():
+        price_element = selector.select_one(soup)
         if price_element:
             price_text = price_element.get_text(strip=True)
             price = clean_price(price_text)
-            if price is not None:
-                break
+        selectors.record(selector, price is not None)
+        if price is not None:
+            break
                 
     return {"name": title, "price": price}
@@ -0,0 +1,75 @@
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0      # first scrape of a newly added product
+PRIORITY_NORMAL = 10   # routine re-checks
+MAX_FAILED = 1000      # failed keys remembered for status(); the oldest are forgotten
+
+
+class ScrapeQueue:
+    """
+    Asyncio priority queue of (priority, seq, key, coro_fn) jobs drained by a
+    few worker tasks. A key that is already queued or running is not queued
+    twice. coro_fn() returns True on success.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._queue: asyncio.PriorityQueue = None
+        self._seq = itertools.count()
+        self._state: dict = {}      # key -> "queued" | "running"
+        self._failed: OrderedDict = OrderedDict()
+        self._tasks: list = []
+
+    def start(self):
+        """Starts the workers on the running event loop (idempotent)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        logger.info(f"Scrape queue started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, key, coro_fn, priority: int = PRIORITY_NORMAL) -> bool:
+        if key in self._state:
+            return False
+        self.start()
+        self._state[key] = "queued"
+        self._failed.pop(key, None)
+        self._queue.put_nowait((priority, next(self._seq), key, coro_fn))
+        return True
+
+    def status(self, key):
+        """'queued', 'running', 'failed' or None (never queued / finished OK)."""
+        if key in self._state:
+            return self._state[key]
+        return "failed" if key in self._failed else None
+
+    async def _run(self):
+        while True:
+            _, _, key, coro_fn = await self._queue.get()
+            self._state[key] = "running"
+            ok = False
+            try:
+                ok = await coro_fn()
+            except Exception as e:
+                logger.error(f"Scrape queue: job {key} failed: {e}")
+            finally:
+                self._state.pop(key, None)
+                if not ok:
+                    self._failed[key] = True
+                    if len(self._failed) > MAX_FAILED:
+                        self._failed.popitem(last=False)
+                self._queue.task_done()
+
+
+scrape_queue = ScrapeQueue()
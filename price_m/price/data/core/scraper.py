@@ -1,22 +1,36 @@
 import httpx
 import asyncio
 import random
+import time
 import logging
 from urllib.parse import urlparse
-from .parser import parse_product_html, config
+from .parser import parse_product_html, registry
 from .database import Product
+from .http_pool import ClientPool, borrow_pool
+from .egress import Egress
+from .latency import LatencyTracker
+from .singleflight import AsyncSingleFlight, TTLCache, canonical_url
+
+# Per-domain latency histograms; they set deadlines and hedge thresholds
+latency = LatencyTracker(lambda: registry.config)
+
+# Concurrent scrapes of the same URL share one fetch; fresh results are reused briefly
+_flight = AsyncSingleFlight()
+_cache = TTLCache(
+    ttl=registry.config.get("scrape_cache", {}).get("ttl", 300),
+    max_entries=registry.config.get("scrape_cache", {}).get("max_entries", 5000),
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def get_random_headers():
     return {
-        "User-Agent": random.choice(config["user_agents"]),
+        "User-Agent": random.choice(registry.config["user_agents"]),
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
         "Accept-Language": "en-US,en;q=0.9",
         "Accept-Encoding": "gzip, deflate, br",
         "DNT": "1",
-        "Connection": "keep-alive",
         "Upgrade-Insecure-Requests": "1",
         "Sec-Fetch-Dest": "document",
         "Sec-Fetch-Mode": "navigate",
@@ -26,20 +40,85 @@ def get_random_headers():
         "Referer": "https://www.google.com/",
     }
 
-async def fetch_url(client: httpx.AsyncClient, url: str) -> str:
+async def _timed_get(pool: ClientPool, url: str, domain: str, avoid: Egress = None) -> httpx.Response:
+    """
+    One GET bounded by the domain's connect / first-byte / total deadlines,
+    sent through the healthiest egress for the domain.
+    """
+    egress = pool.egress.choose(domain, exclude=avoid)
+    client = pool.client_for(url, egress)
+    deadlines = latency.deadlines(domain)
+    timeout = httpx.Timeout(connect=deadlines.connect, read=deadlines.first_byte,
+                            write=deadlines.connect, pool=deadlines.connect)
+    started = time.monotonic()
+    try:
+        response = await asyncio.wait_for(
+            client.get(url, headers=get_random_headers(), timeout=timeout, follow_redirects=True),
+            deadlines.total
+        )
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        # Count timeouts at the deadline so slow sites push their own p95 up
+        latency.observe(domain, deadlines.total)
+        pool.egress.record(egress, domain, False, deadlines.total)
+        raise
+    except Exception:
+        pool.egress.record(egress, domain, False, time.monotonic() - started)
+        raise
+    elapsed = time.monotonic() - started
+    latency.observe(domain, elapsed)
+    # 403/429/503 are how retailers throttle an IP, so they count against the egress
+    ok = response.status_code < 400 or response.status_code == 404
+    pool.egress.record(egress, domain, ok, elapsed, len(response.content))
+    response.extensions["egress"] = egress
+    return response
+
+async def _hedged_get(pool: ClientPool, url: str, domain: str, avoid: Egress = None) -> httpx.Response:
+    """
+    Sends the request and, if it is still running after the domain's p95
+    latency, sends a second copy (within the hedge budget). The first
+    response wins and the other request is cancelled.
+    """
+    latency.budget.note_request()
+    primary = asyncio.ensure_future(_timed_get(pool, url, domain, avoid))
+    delay = latency.hedge_delay(domain)
+    if delay is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done or not latency.budget.try_acquire():
+        return await primary
+
+    logger.info(f"Hedging slow request to {url} after {delay:.2f}s")
+    pending = {primary, asyncio.ensure_future(_timed_get(pool, url, domain, avoid))}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def fetch_url(pool: ClientPool, url: str) -> str:
     """Fetches the HTML content of a URL with retries."""
+    domain = get_domain(url)
+    avoid = None
     max_retries = 3
     for attempt in range(max_retries):
+        started = time.monotonic()
         try:
-            response = await client.get(
-                url, 
-                headers=get_random_headers(), 
-                timeout=20.0, 
-                follow_redirects=True
-            )
+            response = await _hedged_get(pool, url, domain, avoid)
             response.raise_for_status()
+            pool.record(url, True, time.monotonic() - started, len(response.content))
             return response.text
         except httpx.HTTPStatusError as e:
+            pool.record(url, False, time.monotonic() - started, len(e.response.content))
+            # Retry through a different egress than the one that was refused
+            avoid = e.response.extensions.get("egress")
             if e.response.status_code == 403 and attempt < max_retries - 1:
                 wait_time = (attempt + 1) * 2
                 logger.warning(f"403 Forbidden for {url}. Retrying in {wait_time}s...")
@@ -48,10 +127,11 @@ async def fetch_url(client: httpx.AsyncClient, url: str) -> str:
             logger.error(f"HTTP error fetching {url}: {e.response.status_code}")
             break
         except Exception as e:
+            pool.record(url, False, time.monotonic() - started)
             if attempt < max_retries - 1:
                 await asyncio.sleep(1)
                 continue
-            logger.error(f"Error fetching {url}: {e}")
+            logger.error(f"Error fetching {url}: {e!r}")
             break
     return None
 
@@ -63,30 +143,46 @@ def get_domain(url: str) -> str:
         domain = domain[4:]
     return domain
 
-async def scrape_product(client: httpx.AsyncClient, product: Product) -> dict:
+async def get_product_data(pool: ClientPool, url: str) -> dict:
+    """
+    Fetches and parses a product page. Callers asking for the same canonical
+    URL at the same time share one fetch, and results with a price are
+    reused for the configured TTL.
+    """
+    key = canonical_url(url)
+    cached = _cache.get(key)
+    if cached is not None:
+        logger.info(f"Scrape cache hit: {key}")
+        return dict(cached)
+
+    async def fetch_and_parse():
+        html = await fetch_url(pool, url)
+        if not html:
+            return None
+        data = parse_product_html(html, get_domain(url))
+        if data.get("price") is not None:
+            _cache.set(key, data)
+        return data
+
+    data = await _flight.do(key, fetch_and_parse)
+    return dict(data) if data else None
+
+async def scrape_product(pool: ClientPool, product: Product) -> dict:
     """Scrape a single product."""
     logger.info(f"Scraping {product.url}...")
-    html = await fetch_url(client, product.url)
-    if not html:
+    data = await get_product_data(pool, product.url)
+    if not data:
         return None
-        
-    domain = get_domain(product.url)
-    data = parse_product_html(html, domain)
     return {"product_id": product.id, "data": data}
 
-async def fetch_product_data(url: str) -> dict:
+async def fetch_product_data(url: str, pool: ClientPool = None) -> dict:
     """Fetches product details from URL for new products."""
-    async with httpx.AsyncClient() as client:
-        html = await fetch_url(client, url)
-        if not html:
-            return None
-        domain = get_domain(url)
-        data = parse_product_html(html, domain)
-        return data
+    async with borrow_pool(registry.config.get("http", {}), pool) as pool:
+        return await get_product_data(pool, url)
 
-async def scrape_all_products(products: list[Product]) -> list[dict]:
-    """Scrapes a list of products concurrently."""
-    async with httpx.AsyncClient() as client:
-        tasks = [scrape_product(client, product) for product in products]
+async def scrape_all_products(products: list[Product], pool: ClientPool = None) -> list[dict]:
+    """Scrapes a list of products concurrently over the shared client pool."""
+    async with borrow_pool(registry.config.get("http", {}), pool) as pool:
+        tasks = [scrape_product(pool, product) for product in products]
         results = await asyncio.gather(*tasks)
     return [r for r in results if r is not None]
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+import logging
+import soupsieve as sv
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledSelector:
+    """A CSS selector compiled once, with hit/miss counters."""
+    __slots__ = ("source", "pattern", "hits", "misses")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.pattern = sv.compile(source)
+        self.hits = 0
+        self.misses = 0
+
+    def select_one(self, soup):
+        return self.pattern.select_one(soup)
+
+    @property
+    def hit_rate(self) -> float:
+        # Laplace-smoothed so new selectors are neither favoured nor buried
+        return (self.hits + 1) / (self.hits + self.misses + 2)
+
+    def to_dict(self) -> dict:
+        return {
+            "selector": self.source,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+
+class DomainSelectors:
+    """Compiled title/price selectors for one domain, price selectors ordered by hit rate."""
+
+    def __init__(self, domain: str, domain_config: dict, previous: "DomainSelectors" = None):
+        self.domain = domain
+        self._lock = threading.Lock()
+
+        # Keep counters of selectors that survived a config reload unchanged
+        carried = {}
+        if previous is not None:
+            carried = {s.source: s for s in [previous.title] + previous.price}
+
+        self.title = self._compile(domain_config["title_selector"], carried)
+        self.price = [self._compile(s, carried) for s in domain_config["price_selectors"]]
+        self._ordered = self._sorted()
+
+    @staticmethod
+    def _compile(source: str, carried: dict) -> CompiledSelector:
+        selector = CompiledSelector(source)
+        old = carried.get(source)
+        if old is not None:
+            selector.hits, selector.misses = old.hits, old.misses
+        return selector
+
+    def _sorted(self) -> list:
+        # sorted() is stable, so config order breaks ties
+        return sorted(self.price, key=lambda s: s.hit_rate, reverse=True)
+
+    def price_selectors(self) -> list:
+        """Price selectors, best observed hit rate first."""
+        return self._ordered
+
+    def record(self, selector: CompiledSelector, hit: bool):
+        with self._lock:
+            if hit:
+                selector.hits += 1
+            else:
+                selector.misses += 1
+            if selector is not self.title:
+                self._ordered = self._sorted()
+
+    def stats(self) -> dict:
+        return {
+            "title": self.title.to_dict(),
+            "price": [s.to_dict() for s in self._ordered],
+        }
+
+
+class SelectorRegistry:
+    """
+    Holds compiled selectors for every configured domain and reloads
+    config.json when its mtime changes. A reload builds a complete new
+    snapshot and swaps it in with a single assignment, so readers never
+    see a half-loaded config; a file that fails to parse keeps the old one.
+    """
+
+    def __init__(self, path: str, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        # (mtime, raw config, {domain: DomainSelectors})
+        self._snapshot = (None, {}, {})
+        if not self._load():
+            raise RuntimeError(f"Could not load selector config from {path}")
+
+    def _load(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+            _, _, old_domains = self._snapshot
+            domains = {
+                domain: DomainSelectors(domain, cfg, old_domains.get(domain))
+                for domain, cfg in raw.get("domains", {}).items()
+            }
+        except Exception as e:
+            logger.error(f"Selector config reload failed, keeping previous version: {e}")
+            return False
+
+        self._snapshot = (mtime, raw, domains)
+        logger.info(f"Loaded selectors for {len(domains)} domains from {self.path}")
+        return True
+
+    def maybe_reload(self):
+        """Reload config.json if it changed on disk (checked at most every check_interval seconds)."""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return
+            if mtime != self._snapshot[0]:
+                self._load()
+
+    @property
+    def config(self) -> dict:
+        self.maybe_reload()
+        return self._snapshot[1]
+
+    def get(self, domain: str) -> DomainSelectors:
+        self.maybe_reload()
+        return self._snapshot[2].get(domain)
+
+    def stats(self) -> dict:
+        """Per-domain, per-selector hit/miss counters."""
+        return {domain: ds.stats() for domain, ds in self._snapshot[2].items()}
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Query parameters that never change which product a URL points to. Not here on
+# purpose: smid (Amazon seller) and psc (selected variant) pick a different offer.
+# Names are matched exactly, prefixes only as written (so "refinements" or "tags" stay).
+TRACKING_PARAMS = {"ref", "tag", "affid", "affExtParam", "_encoding"}
+TRACKING_PREFIXES = ("utm_", "ref_")
+
+
+def canonical_url(url: str) -> str:
+    """Normalises a product URL for de-duplication: lower-case host, no fragment or tracking params."""
+    parsed = urlparse(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+             if k not in TRACKING_PARAMS and not k.startswith(TRACKING_PREFIXES)]
+    return urlunparse((
+        parsed.scheme.lower(),
+        parsed.netloc.lower(),
+        parsed.path.rstrip("/") or "/",
+        "",
+        urlencode(sorted(query)),
+        "",
+    ))
+
+
+class AsyncSingleFlight:
+    """Runs one coroutine per key at a time; concurrent callers await the same result."""
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, coro_fn):
+        future = self._calls.get(key)
+        if future is not None:
+            # shield: one caller being cancelled must not cancel the shared fetch
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(coro_fn())
+        self._calls[key] = future
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
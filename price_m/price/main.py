@@ -6,6 +6,8 @@ from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from core.database import init_db, get_session, Product, PriceHistory
 from core.scraper import scrape_all_products
+from core.parser import registry
+from core import http_pool
 from core.notifier import send_price_drop_email
 
 # Ensure the project root is in the path
@@ -100,6 +102,7 @@ async def track_prices():
 async def main():
     init_db()
     seed_database()
+    http_pool.open_pool(registry.config.get("http", {}))
     
     # Setup scheduler for periodic runs
     scheduler = AsyncIOScheduler()
@@ -112,8 +115,11 @@ async def main():
         # Keep the main async loop alive
         while True:
             await asyncio.sleep(3600)
-    except (KeyboardInterrupt, SystemExit):
+    except (KeyboardInterrupt, SystemExit, asyncio.CancelledError):
         pass
+    finally:
+        scheduler.shutdown(wait=False)
+        await http_pool.close_pool()
 
 if __name__ == "__main__":
     try:
@@ -1,12 +1,12 @@
 import os
 import sys
 from fastapi import FastAPI, Request, BackgroundTasks, Depends
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
 import logging
 import json
@@ -15,8 +15,15 @@ import json
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from data.core.database import init_db, get_session, Product, PriceHistory, User, RewardTransaction
-from data.core.scraper import fetch_product_data, scrape_all_products
-from data.core.notifier import send_price_drop_email
+from data.core.scraper import fetch_product_data, scrape_all_products, latency as scrape_latency
+from data.core.parser import registry as selector_registry
+from data.core import http_pool
+from data.core.scrape_queue import scrape_queue, PRIORITY_HIGH
+from data.core.notifier import AlertDigest
+from data.core.alert_rules import AlertRuleIndex
+from data.core.events import event_bus, sse_stream, user_topic, product_topic
+from data.core.downsample import downsample
+from data.core.history_store import history_store
 from data.core.importer import import_urls_from_file
 from starlette.middleware.sessions import SessionMiddleware
 import routers.auth as auth
@@ -87,6 +94,8 @@ def seed_database():
     db.close()
 
 # Reuse price tracking logic from main.py
+ALERT_ICONS = {"target": "🎯", "drop": "🔥", "rise": "📈"}
+
 async def track_prices_task():
     """Background task for price tracking."""
     logger.info("Starting background price tracking...")
@@ -99,6 +108,11 @@ async def track_prices_task():
 
         results = await scrape_all_products(products)
 
+        # One email per user per run; mega drops go out as soon as they're seen
+        alerts = selector_registry.config.get("alerts", {})
+        digest = AlertDigest(alerts.get("mega_drop_pct") if alerts.get("send_mega_immediately", True) else None)
+        rules = AlertRuleIndex.load(db)
+
         for result in results:
             product_id = result["product_id"]
             data = result["data"]
@@ -112,38 +126,28 @@ async def track_prices_task():
             if not product.name and name:
                 product.name = name
             
-            last_history = db.query(PriceHistory).filter(PriceHistory.product_id == product_id).order_by(PriceHistory.timestamp.desc()).first()
-            new_history = PriceHistory(product_id=product_id, price=current_price)
-            db.add(new_history)
-            
-            old_price = last_history.price if last_history else None
-            
-            # Check alerts for all users tracking this product
-            from data.core.database import user_product
-            trackers = db.execute(user_product.select().where(user_product.c.product_id == product_id)).fetchall()
+            old_price = history_store.latest(db, product_id)
+            history_store.record(db, product_id, current_price)
+            # Saved before anyone hears about it: no alert for a price that was never stored
+            db.commit()
             
-            for tracker in trackers:
-                target = tracker.target_price
-                user_id = tracker.user_id
-                
-                if old_price is not None:
-                    drop_pct = ((old_price - current_price) / old_price) * 100 if current_price < old_price else 0
-                    rise_pct = ((current_price - old_price) / old_price) * 100 if current_price > old_price else 0
-                    
-                    user = db.query(User).filter(User.id == user_id).first()
-                    receiver_email = user.email if user else "guest@example.com"
-                    
-                    if target and current_price <= target:
-                        logger.info(f"🎯 TARGET HIT: {product.name} (₹{current_price}) for user {user_id}")
-                        send_price_drop_email(product.name, product.url, old_price, current_price, receiver_email)
-                    elif drop_pct >= 5: # Significant drop alert (>5%)
-                        logger.info(f"🔥 PRICE DROP: {product.name} fell by {drop_pct:.1f}% for user {user_id}")
-                        send_price_drop_email(product.name, product.url, old_price, current_price, receiver_email)
-                    elif rise_pct >= 5: # Significant rise alert (>5%)
-                        logger.info(f"📈 PRICE RISE: {product.name} increased by {rise_pct:.1f}% for user {user_id}")
-                        send_price_drop_email(product.name, product.url, old_price, current_price, receiver_email, is_drop=False)
+            if old_price is None:
+                continue
 
-        db.commit()
+            if current_price != old_price:
+                event_bus.publish(product_topic(product_id), "price",
+                                  {"product_id": product_id, "price": current_price, "old_price": old_price})
+
+            # Only the trackers whose rule fires (target hit, or a 5%+ move)
+            for user_id, receiver_email, kind in rules.matches(product_id, old_price, current_price):
+                logger.info(f"{ALERT_ICONS[kind]} {kind.upper()}: {product.name} ₹{old_price} → ₹{current_price} for {receiver_email}")
+                digest.add(receiver_email or "guest@example.com", kind, product.name, product.url, old_price, current_price)
+                event_bus.publish(user_topic(user_id), "alert", {"product_id": product_id, "kind": kind, "name": product.name,
+                                                                 "price": current_price, "old_price": old_price})
+
+            await asyncio.to_thread(digest.send_urgent)
+
+        await asyncio.to_thread(digest.flush)
     except Exception as e:
         logger.error(f"Error in tracking: {e}")
         db.rollback()
@@ -151,13 +155,35 @@ async def track_prices_task():
         db.close()
     logger.info("Background price tracking completed.")
 
+def maintain_history():
+    """Daily: move tracker.db history into month files and drop months past retention."""
+    cfg = selector_registry.config.get("history", {})
+    db = get_session()
+    try:
+        moved = 0
+        while True:
+            n = history_store.migrate_legacy(db, cfg.get("migrate_batch", 5000))
+            moved += n
+            if n < cfg.get("migrate_batch", 5000):
+                break
+        dropped = history_store.drop_before(cfg["retention_months"]) if cfg.get("retention_months") else []
+        if moved or dropped:
+            logger.info(f"History: moved {moved} rows into month files, dropped {dropped or 'no months'}")
+    finally:
+        db.close()
+
 # Scheduler
 scheduler = AsyncIOScheduler()
 
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    history_store.configure(selector_registry.config.get("history", {}), os.path.dirname(os.path.abspath(__file__)))
     seed_database()
+
+    # One keep-alive client pool for the lifetime of the app
+    http_pool.open_pool(selector_registry.config.get("http", {}))
+    scrape_queue.start()
     
     # Bulk Import from urls.txt
     urls_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'urls.txt')
@@ -169,8 +195,16 @@ async def startup_event():
     asyncio.create_task(track_prices_task())
     # Schedule every 6 hours
     scheduler.add_job(track_prices_task, 'interval', hours=6)
+    if history_store.partitioned:
+        scheduler.add_job(asyncio.to_thread, 'cron', args=[maintain_history], hour=3, id="history_maintenance")
     scheduler.start()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    scheduler.shutdown(wait=False)
+    await scrape_queue.stop()
+    await http_pool.close_pool()
+
 @app.get("/", response_class=HTMLResponse)
 async def dashboard(request: Request, tab: str = "all", platform: str = None, category: str = None):
     db = get_session()
@@ -184,10 +218,17 @@ async def dashboard(request: Request, tab: str = "all", platform: str = None, ca
         # For guests, show all public products or a selection
         products_db = db.query(Product).limit(10).all()
         
+    charts = selector_registry.config.get("charts", {})
+    chart_points = charts.get("points", 150)
+    # Only the charted window is read, so partitioned history opens just those month files
+    since = datetime.utcnow() - timedelta(days=charts["days"]) if charts.get("days") else None
+    histories = history_store.series_many(db, [p.id for p in products_db], since=since)
     product_list = []
     for p_db in products_db:
-        history_db = db.query(PriceHistory).filter(PriceHistory.product_id == p_db.id).order_by(PriceHistory.timestamp.asc()).all()
+        history_db = histories[p_db.id]
         latest = history_db[-1].price if history_db else None
+        if latest is None and since:
+            latest = history_store.latest(db, p_db.id)     # not checked within the charted window
         
         # Determine previous price
         previous = None
@@ -231,7 +272,9 @@ async def dashboard(request: Request, tab: str = "all", platform: str = None, ca
             "lowest_ever": True,
             "image_url": p_db.image_url or "https://via.placeholder.com/150",
             "last_checked": last_checked.strftime("%Y-%m-%d %H:%M"),
-            "history": [{"price": h.price, "date": h.timestamp.strftime("%m/%d %H:%M")} for h in history_db]
+            "history": [{"price": h.price, "date": h.timestamp.strftime("%m/%d %H:%M")}
+                        for h in downsample(history_db, chart_points, y=lambda h: h.price,
+                                            x=lambda h: h.timestamp.timestamp())]
         }
         
         if history_db and latest:
@@ -323,6 +366,76 @@ async def ride_page(request: Request):
 async def scrape_now(background_tasks: BackgroundTasks):
     background_tasks.add_task(track_prices_task)
 
+def _stats_denied(request: Request):
+    """
+    None if the session may read the operational stats endpoints, else the error
+    response: login required, and the user must be listed in config admin.emails
+    (an empty list admits nobody).
+    """
+    user_id = request.session.get("user_id")
+    if not user_id: return JSONResponse({"error": "Login required"}, 401)
+    admins = {e.lower() for e in selector_registry.config.get("admin", {}).get("emails", [])}
+    db = get_session()
+    try:
+        user = db.query(User).get(user_id)
+    finally:
+        db.close()
+    if not user or user.email.lower() not in admins:
+        return JSONResponse({"error": "Admin only"}, 403)
+    return None
+
+@app.get("/api/selector-stats")
+async def selector_stats(request: Request):
+    """Per-domain hit/miss counters for every configured selector."""
+    denied = _stats_denied(request)
+    if denied: return denied
+    return selector_registry.stats()
+
+@app.get("/api/http-stats")
+async def http_stats(request: Request):
+    """Per-origin connection stats of the shared HTTP client pool."""
+    denied = _stats_denied(request)
+    if denied: return denied
+    pool = http_pool.get_pool()
+    return pool.stats() if pool else {}
+
+@app.get("/api/egress-stats")
+async def egress_stats(request: Request):
+    """Throughput and per-domain health of every configured egress."""
+    denied = _stats_denied(request)
+    if denied: return denied
+    pool = http_pool.get_pool()
+    return pool.egress.stats() if pool else {}
+
+@app.get("/api/events")
+async def events(request: Request):
+    """Server-Sent Events: price changes on the user's tracked products and their alerts."""
+    user_id = request.session.get("user_id")
+    if not user_id: return JSONResponse({"error": "Login required"}, 401)
+    db = get_session()
+    try:
+        user = db.query(User).get(user_id)
+        topics = [user_topic(user_id)] + [product_topic(p.id) for p in (user.tracked_products if user else [])]
+    finally:
+        db.close()
+    sub = event_bus.subscribe(topics)
+    return StreamingResponse(sse_stream(event_bus, sub), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/event-stats")
+async def event_stats(request: Request):
+    """Live-update subscribers, topics and dropped events."""
+    denied = _stats_denied(request)
+    if denied: return denied
+    return event_bus.stats()
+
+@app.get("/api/latency-stats")
+async def latency_stats(request: Request):
+    """Per-domain latency percentiles, current deadlines and hedge counters."""
+    denied = _stats_denied(request)
+    if denied: return denied
+    return scrape_latency.stats()
+
 @app.post("/api/toggle-pause")
 async def toggle_pause(request: Request, data: dict):
     user_id = request.session.get("user_id")
@@ -368,8 +481,37 @@ def get_db():
     finally:
         db.close()
 
+async def first_scrape(product_id: int) -> bool:
+    """Scrape-queue job: fills in name and first price of a newly added product."""
+    db = get_session()
+    try:
+        product = db.query(Product).get(product_id)
+        if not product:
+            return True
+        p_data = await fetch_product_data(product.url)
+        if not p_data or p_data.get("price") is None:
+            logger.warning(f"First scrape failed for {product.url}")
+            return False
+        if p_data.get("name") and not product.name:
+            product.name = p_data["name"]
+        history_store.record(db, product.id, p_data["price"])
+        db.commit()
+        event_bus.publish(product_topic(product.id), "price",
+                          {"product_id": product.id, "price": p_data["price"], "old_price": None})
+        return True
+    except Exception as e:
+        logger.error(f"First scrape error for product {product_id}: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
 @app.post("/api/add-product")
-async def add_product(request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def add_product(request: Request, db: Session = Depends(get_db)):
+    """
+    Saves the product and returns immediately; the first scrape runs on the
+    background queue and the page polls /api/product-status/{id}.
+    """
     user_id = request.session.get("user_id")
     if not user_id: return JSONResponse({"error": "Login required"}, 401)
     
@@ -380,28 +522,15 @@ async def add_product(request: Request, background_tasks: BackgroundTasks, db: S
     
     # Check if already in DB
     product = db.query(Product).filter(Product.url == url).first()
-    if not product:
-        domain = get_domain(url)
-        try:
-            p_data = await fetch_product_data(url)
-            if p_data and p_data.get("name"):
-                product = Product(url=url, domain=domain, name=p_data.get("name"))
-                db.add(product)
-                db.flush()
-                if p_data.get("price"):
-                    from data.core.database import PriceHistory
-                    new_history = PriceHistory(product_id=product.id, price=p_data["price"])
-                    db.add(new_history)
-        except Exception as e:
-            logger.error(f"Scrape error: {e}")
-            return JSONResponse({"error": "Website not currently supported"}, 400)
-            
-    if not product:
-        return JSONResponse({"error": "Failed to fetch product data"}, 400)
+    is_new = product is None
+    if is_new:
+        product = Product(url=url, domain=get_domain(url))
+        db.add(product)
+        db.flush()
         
     user = db.query(User).get(user_id)
-    if user not in product.users:
-        product.users.append(user)
+    if user not in product.tracked_by_users:
+        product.tracked_by_users.append(user)
         db.commit()
         
         # Set frequency and initial target
@@ -417,11 +546,31 @@ async def add_product(request: Request, background_tasks: BackgroundTasks, db: S
         db.execute(update_stmt)
         db.commit()
         
-        background_tasks.add_task(track_prices_task)
-        return {"status": "success", "message": "Product added to tracking"}
+        if is_new:
+            product_id = product.id
+            scrape_queue.enqueue(("first", product_id), lambda: first_scrape(product_id), priority=PRIORITY_HIGH)
+        return {"status": "success", "message": "Product added to tracking", "id": product.id,
+                "pending": is_new}
     
     return JSONResponse({"error": "Already tracking this product"}, 400)
 
+@app.get("/api/product-status/{product_id}")
+async def product_status(product_id: int, request: Request, db: Session = Depends(get_db)):
+    """Lightweight first-scrape status: pending / queued / running / failed / ready."""
+    user_id = request.session.get("user_id")
+    if not user_id: return JSONResponse({"error": "Login required"}, 401)
+    product = db.query(Product).get(product_id)
+    if not product or user_id not in [u.id for u in product.users]:
+        return JSONResponse({"error": "Product not found"}, 404)
+    latest = history_store.latest(db, product_id)
+    queued = scrape_queue.status(("first", product_id))
+    if latest is not None:
+        status = "ready"
+    else:
+        status = queued or "pending"
+    return {"id": product.id, "status": status, "name": product.name,
+            "price": latest}
+
 @app.post("/api/delete-product/{product_id}")
 async def delete_product(product_id: int, request: Request, db: Session = Depends(get_db)):
     user_id = request.session.get("user_id")
@@ -446,9 +595,7 @@ async def test_email(product_id: int, request: Request, db: Session = Depends(ge
         from data.core.notifier import send_price_drop_email
         
         # Get latest price to simulate a realistic drop
-        from data.core.database import PriceHistory
-        last_history = db.query(PriceHistory).filter(PriceHistory.product_id == product.id).order_by(PriceHistory.timestamp.desc()).first()
-        current = last_history.price if last_history else 1000.0
+        current = history_store.latest(db, product.id) or 1000.0
         old_price = current * 1.2 # 20% more
         
         receiver_email = user.email if user else "guest@example.com"